@@ -0,0 +1,158 @@
+"""Benchmark of the generation throughput on synthetic data vaults.
+
+Creates a metadata directory with the requested number of hubs, links and
+satellites, and times each phase of the generation separately. The result is
+printed, or saved with --out, as JSON so that runs can be compared over time.
+
+$ python -m benchmarks.generation --hubs 100 --satellites 200 --columns 50 --out bench.json
+"""
+import csv, json, platform, sys, tempfile, time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import click
+
+from dwgenerator.dbobjects import DB, Column
+from dwgenerator.mappings import TableMappings, ColumnMappings, Mappings
+from dwgenerator.templates import Templates
+from tests.utils import create_example_hub, create_example_link, create_example_satellite
+
+TABLE_MAPPING_FIELDS = ['source_schema', 'source_table', 'source_filter', 'target_schema', 'target_table']
+COLUMN_MAPPING_FIELDS = ['src_schema', 'src_table', 'src_column', 'transformation', 'tgt_schema', 'tgt_table', 'tgt_column']
+
+def example_satellite(number, variation, columns, **properties):
+  """The example satellite of the tests, with attributes added up to the requested number of attributes."""
+  satellite = create_example_satellite(number, f'_{variation}', **properties)
+  extra_attributes = [Column(f'attribute{i}', 'text', satellite) for i in range(3, columns + 1)]
+  satellite.columns = satellite.columns[:-1] + extra_attributes + satellite.columns[-1:]
+  return satellite
+
+def source_column(target_column):
+  if target_column == 'load_dts':
+    return ('ingestion_ts', '')
+  elif target_column == 'rec_src':
+    return ('', "'src'")
+  else:
+    return (f'src_{target_column}', '')
+
+def create_metadata(path, hubs=10, links=10, satellites=10, columns=10, sources=2, mapping_rows=0, generate_type='table'):
+  """Write a synthetic metadata directory and return the number of rows of its files."""
+  path = Path(path)
+  # The tables of the tests, so that the benchmark covers the same shapes of tables
+  tables = [create_example_hub(i, generate_type=generate_type) for i in range(hubs)]
+  tables += [create_example_link(i % hubs, (i + 1) % hubs, generate_type=generate_type) for i in range(links)]
+  tables += [example_satellite(i % hubs, i // hubs, columns, generate_type=generate_type) for i in range(satellites)]
+
+  table_def_path = path / 'table_def' / 'dv'
+  table_def_path.mkdir(parents=True)
+  for table in tables:
+    with open(table_def_path / f'{table.name}.csv', 'w', newline='', encoding='utf-8') as table_file:
+      writer = csv.writer(table_file)
+      writer.writerow(['name', 'type'])
+      writer.writerows((column.name, column.type) for column in table.columns)
+      writer.writerows((f'#{name}', value) for (name, value) in table.properties.items())
+
+  table_mappings = []
+  column_mappings = []
+  for table in tables:
+    for source_number in range(sources):
+      source_table = f'{table.name}_source{source_number}'
+      table_mappings.append(['src', source_table, '', 'dv', table.name])
+      for column in table.columns:
+        column_mappings.append(['src', source_table, *source_column(column.name), 'dv', table.name, column.name])
+  # Rows that map to tables that are not generated, to get the requested total number of rows
+  for i in range(mapping_rows - len(column_mappings)):
+    column_mappings.append(['src', f'other{i // 100}', f'column{i % 100}', '', 'other', f'other{i // 100}', f'column{i % 100}'])
+
+  for (mapping_path, fields, rows) in [
+    (path / 'mapping' / 'table' / 'table_mappings.csv', TABLE_MAPPING_FIELDS, table_mappings),
+    (path / 'mapping' / 'column' / 'column_mappings.csv', COLUMN_MAPPING_FIELDS, column_mappings),
+  ]:
+    mapping_path.parent.mkdir(parents=True)
+    with open(mapping_path, 'w', newline='', encoding='utf-8') as mapping_file:
+      writer = csv.writer(mapping_file)
+      writer.writerow(fields)
+      writer.writerows(rows)
+
+  return {
+    'tables': len(tables),
+    'table_mapping_rows': len(table_mappings),
+    'column_mapping_rows': len(column_mappings),
+  }
+
+class Timer:
+  def __init__(self):
+    self.timings = {}
+
+  def time(self, phase, function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    self.timings[phase] = self.timings.get(phase, 0.0) + time.perf_counter() - start
+    return result
+
+def run_generation(metadata_path, dbtype):
+  """Generate code for all tables in the metadata directory and return the time of each phase."""
+  metadata_path = Path(metadata_path)
+  timer = Timer()
+  db = timer.time('read_table_defs', DB.read, metadata_path / 'table_def')
+  tm = timer.time('read_table_mappings', TableMappings.read, metadata_path / 'mapping' / 'table')
+  cm = timer.time('read_column_mappings', ColumnMappings.read, metadata_path / 'mapping' / 'column')
+  tables = list(db['dv'].tables.values())
+  mappings = timer.time('build_mappings', lambda: Mappings(tm, cm, tables + cm.source_tables()))
+  templates = Templates(dbtype)
+  size = 0
+  for target_table in tables:
+    timer.time('check', target_table.check)
+    timer.time('check_mappings', mappings.check, target_table)
+    render_results = timer.time('render', lambda: list(templates.render(target_table, mappings)))
+    size += sum(len(sql) for (_, sql) in render_results)
+  return timer.timings, size
+
+def benchmark(hubs, links, satellites, columns, sources, mapping_rows, generate_type, dbtype, repeat):
+  parameters = dict(
+    hubs=hubs, links=links, satellites=satellites, columns=columns, sources=sources,
+    mapping_rows=mapping_rows, generate_type=generate_type, dbtype=dbtype, repeat=repeat,
+  )
+  with tempfile.TemporaryDirectory() as tmp_dir:
+    counts = create_metadata(
+      tmp_dir, hubs, links, satellites, columns, sources, mapping_rows, generate_type
+    )
+    runs = [run_generation(tmp_dir, dbtype) for _ in range(repeat)]
+  # The fastest run is the least disturbed by other processes
+  timings = {
+    phase: min(run_timings[phase] for (run_timings, _) in runs)
+    for phase in runs[0][0]
+  }
+  timings['total'] = min(sum(run_timings.values()) for (run_timings, _) in runs)
+  counts['generated_bytes'] = runs[0][1]
+  return {
+    'timestamp': datetime.now(timezone.utc).isoformat(),
+    'python': platform.python_version(),
+    'parameters': parameters,
+    'counts': counts,
+    'timings': timings,
+  }
+
+@click.command()
+@click.option('--hubs', help='Number of hubs', type=click.IntRange(min=1), default=10, show_default=True)
+@click.option('--links', help='Number of links', type=click.IntRange(min=0), default=10, show_default=True)
+@click.option('--satellites', help='Number of satellites', type=click.IntRange(min=0), default=10, show_default=True)
+@click.option('--columns', help='Number of attributes in each satellite, the satellites of the tests have two', type=click.IntRange(min=2), default=10, show_default=True)
+@click.option('--sources', help='Number of source tables for each target table', type=click.IntRange(min=1), default=2, show_default=True)
+@click.option('--mapping-rows', help='Total number of column mapping rows, padded with rows to other tables', type=click.IntRange(min=0), default=0)
+@click.option('--generate-type', help='The generate_type of the tables', type=click.Choice(['view', 'table']), default='table', show_default=True)
+@click.option('--dbtype', help='The target database type', default='standard', show_default=True)
+@click.option('--repeat', help='Number of runs, the fastest time of each phase is reported', type=click.IntRange(min=1), default=1, show_default=True)
+@click.option('--out', help='Save the result as JSON to this file', type=click.Path(dir_okay=False))
+def main(out, **parameters):
+  """Benchmark the generation on a synthetic data vault"""
+  result = benchmark(**parameters)
+  if out:
+    with open(out, 'w', encoding='utf-8') as out_file:
+      json.dump(result, out_file, indent=2)
+  else:
+    json.dump(result, sys.stdout, indent=2)
+    print()
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,12 @@
+import os, sys
+from pathlib import Path
+
+def user_cache_dir(*parts):
+  """The per user cache directory of dwgenerator, optionally with sub directories."""
+  if os.name == 'nt':
+    base = os.environ.get('LOCALAPPDATA') or Path.home() / 'AppData' / 'Local'
+  elif sys.platform == 'darwin':
+    base = Path.home() / 'Library' / 'Caches'
+  else:
+    base = os.environ.get('XDG_CACHE_HOME') or Path.home() / '.cache'
+  return Path(base, 'dwgenerator', *parts)
@@ -1,37 +1,161 @@
-import json, sys, csv
+import json, sys, os
+import cProfile, multiprocessing, pstats
 from pathlib import Path
 
 import click
 
-from .dbobjects import DB, Schema, Table, create_typed_table, Hub, Link, Satellite, MetaDataError, MetaDataWarning
+from .dbobjects import create_typed_table, Hub, Link, Satellite, MetaDataError, MetaDataWarning
 from .mappings import TableMappings, ColumnMappings, Mappings
 from .templates import Templates
+from .manifest import Manifest, table_fingerprint
+from .output import OutputWriter, BundleWriter, SpoolWriter, spool_chunks
+from .dependencies import dependency_order, etl_schedule, schedule_makefile
+from .cache import user_cache_dir
+from .snapshot import load_metadata, default_snapshot_path
+from .timings import Timings
 
 @click.group()
 def cli():
     """DW Generator"""
     pass
 
+def print_chunks(relative_path, chunks):
+  for chunk in chunks:
+    sys.stdout.write(chunk)
+  sys.stdout.write('\n')
+
+def parse_settings(ctx, param, value):
+  settings = {}
+  for setting in value:
+    (name, equals, setting_value) = setting.partition('=')
+    if not equals or not name:
+      raise click.BadParameter(f'{setting} should be on the format NAME=VALUE')
+    settings[name.strip().lower()] = setting_value.strip()
+  return settings
+
+def generate_table(target_table_info, db, mappings, templates, verbose, writer):
+  """Check and render one target table.
+
+  The SQL of each output file is streamed to writer.open(relative_path). The files
+  of the table are closed when all of them have rendered, and discarded if any
+  render fails, so that a failing render leaves no partial output behind.
+  Returns the (path, close result) pairs, the (message, color) pairs to report and
+  the timings, so that the caller can output them in the order of the target tables.
+  """
+  render_results = []
+  messages = []
+  timings = Timings()
+  table_name = '{schema}.{table}'.format(**target_table_info)
+  try:
+    target_table = db[target_table_info['schema']][target_table_info['table']]
+    if verbose:
+      messages.append((str(target_table), 'cyan'))
+    if target_table.table_type in ['hub', 'link', 'satellite']:
+      with timings.phase('check table', table_name):
+        target_table.check()
+      with timings.phase('check mappings', table_name):
+        mappings.check(target_table)
+      out_files = []
+      try:
+        for (template_path, out_path) in templates.outputs(target_table):
+          with timings.phase(f'render {template_path}', table_name):
+            out_file = writer.open(out_path)
+            out_files.append((out_path, out_file))
+            for chunk in templates.generate_template(template_path, target_table=target_table, mappings=mappings):
+              out_file.write(chunk)
+      except BaseException:
+        for (_, out_file) in out_files:
+          out_file.discard()
+        raise
+      render_results = [(out_path, out_file.close()) for (out_path, out_file) in out_files]
+    else:
+      messages.append(('Unknown table type: {}'.format(target_table), 'yellow'))
+  except MetaDataError as e:
+    messages.append(("Meta data error: {}".format(e), 'red'))
+  except MetaDataWarning as e:
+    messages.append(("Meta data warning: {}".format(e), 'yellow'))
+  return render_results, messages, timings
+
+def order_on_dependencies(target_table_infos, db, mappings):
+  """Order the target tables so that each table comes after the tables it depends on.
+
+  Target tables without a table def are put last, and are reported when generated.
+  """
+  tables = []
+  for info in target_table_infos:
+    try:
+      tables.append(db[info['schema']][info['table']])
+    except KeyError:
+      pass
+  try:
+    order = {table.full_name: i for (i, table) in enumerate(dependency_order(tables, mappings))}
+  except MetaDataError as e:
+    raise click.ClickException(str(e))
+  return sorted(
+    target_table_infos,
+    key=lambda info: order.get('{schema}.{table}'.format(**info), len(order))
+  )
+
+# State shared with the worker processes of generate-view --jobs. With the fork
+# start method it is inherited from the parent instead of being pickled.
+_worker_state = {}
+
+def _init_worker(db, mappings, templates_args, verbose, out):
+  # Each worker writes its files itself, so that the SQL is not sent back to the parent
+  writer = OutputWriter(out) if out else SpoolWriter()
+  _worker_state.update(db=db, mappings=mappings, templates=Templates(**templates_args), verbose=verbose, writer=writer)
+
+def _generate_table_worker(target_table_info):
+  return generate_table(target_table_info, **_worker_state)
+
 @cli.command()
 @click.option('--metadata', help='The metadata directory', type=click.Path(exists=True), default='metadata', show_default=True)
 @click.option('--dbtype', help='The target database type', default='standard', show_default=True)
 @click.option('--target', help='Mappings to schema.table')
 @click.option('--out', help='Output directory')
+@click.option('--read-jobs', help='Number of threads reading the metadata files', type=click.IntRange(min=1), default=4, show_default=True)
+@click.option('--snapshot/--no-snapshot', help='Cache the parsed metadata in the user cache directory', default=True, show_default=True)
+@click.option('--template-cache/--no-template-cache', help='Cache compiled templates in the user cache directory', default=True, show_default=True)
+@click.option('--compiled-templates', help='Directory with templates precompiled by util compile-templates', type=click.Path(exists=True, file_okay=False))
+@click.option('--set', 'settings', help='Default of a table property for all tables, e.g. --set key_strategy=md5', multiple=True, metavar='NAME=VALUE', callback=parse_settings)
+@click.option('--prune', help='Delete .sql files in --out that were not generated by this run', is_flag=True)
+@click.option('--incremental', help='Only regenerate target tables whose table defs, mappings or templates have changed since the last run to --out', is_flag=True)
+@click.option('--bundle', help='Write all SQL to --out as bundle files ordered on dependencies, one for all schemas or one for each schema', type=click.Choice(['all', 'schema']))
+@click.option('--bundle-max-size', help='Start a new bundle file when a bundle has reached this number of bytes', type=click.IntRange(min=1))
+@click.option('-j', '--jobs', help='Number of processes rendering target tables, 0 means one per CPU', type=click.IntRange(min=0), default=1, show_default=True)
+@click.option('--timings', 'show_timings', help='Print the time spent in each phase and on the slowest tables', is_flag=True)
+@click.option('--profile', help='Profile the run with cProfile and save the stats to this file', type=click.Path(dir_okay=False))
 @click.option('-v', '--verbose', help='Print extra information', count=True)
-def generate_view(metadata, dbtype, target, out, verbose):
+def generate_view(metadata, dbtype, target, out, read_jobs, snapshot, template_cache, compiled_templates, settings, prune, incremental, bundle, bundle_max_size, jobs, show_timings, profile, verbose):
   """Generate view SQL for a table"""
-  templates = Templates(dbtype)
+  if profile:
+    profiler = cProfile.Profile()
+    def save_profile():
+      profiler.disable()
+      profiler.dump_stats(profile)
+      if verbose:
+        pstats.Stats(profiler, stream=sys.stderr).sort_stats('cumulative').print_stats(20)
+    click.get_current_context().call_on_close(save_profile)
+    profiler.enable()
+  timings = Timings()
+  templates_args = dict(
+    dbtype=dbtype,
+    bytecode_cache_dir=user_cache_dir('templates') if template_cache else None,
+    compiled_dir=compiled_templates,
+  )
+  templates = Templates(**templates_args)
+  if compiled_templates and not templates.compiled:
+    click.secho('No precompiled templates for {} from the current templates in {}, compiling the templates'.format(dbtype, compiled_templates), file=sys.stderr, fg='yellow')
   metadata_path = Path(metadata)
-  mappings_path = metadata_path / 'mapping'
-  tm = TableMappings.read(mappings_path / 'table')
-  cm = ColumnMappings.read(mappings_path / 'column')
-  target_tables_path = metadata_path / 'target_tables.csv'
-  with open(target_tables_path, encoding='utf-8') as target_tables_file:
-    target_tables = list(csv.DictReader(target_tables_file, dialect=csv.excel))
-  table_def_path = metadata_path / 'table_def'
-  db = DB.read(table_def_path)
+  snapshot_path = default_snapshot_path(metadata_path) if snapshot else None
+  db, tm, cm, target_tables = load_metadata(metadata_path, snapshot_path, read_jobs, timings)
+  if settings:
+    for schema in db.schemas.values():
+      for table in schema.tables.values():
+        table.set_default_properties(**settings)
   tables = list(db['dv'].tables.values()) # FIXME
-  mappings = Mappings(tm, cm, tables + cm.source_tables())
+  with timings.phase('build mappings'):
+    mappings = Mappings(tm, cm, tables + cm.source_tables())
   if target:
     schema_name, table_name = target.split('.')
     tables = [table for table in tables if table.schema == schema_name and table.name == table_name]
@@ -39,31 +163,170 @@ def generate_view(metadata, dbtype, target, out, verbose):
       tables = [db[schema_name][table_name]]
     except IndexError:
       tables = []
-  for target_table_info in target_tables:
-    if target_table_info['generate'] == 'true':
+  target_table_infos = [info for info in target_tables if info['generate'] == 'true']
+  jobs = jobs or os.cpu_count()
+  # The incremental tables of a schema share a watermark table, that is generated once for the schema
+  watermark_schemas = sorted(set(
+    info['schema'] for info in target_table_infos
+    if info['schema'] in db.schemas and info['table'] in db[info['schema']].tables
+    and db[info['schema']][info['table']].properties['generate_type'] == 'incremental'
+  ))
+
+  writer = OutputWriter(out) if out else None
+  bundles = None
+  if bundle:
+    if not out:
+      raise click.UsageError('--bundle requires --out')
+    if incremental:
+      raise click.UsageError('--bundle cannot be combined with --incremental')
+    bundles = BundleWriter(writer, by_schema=bundle == 'schema', max_size=bundle_max_size)
+    target_table_infos = order_on_dependencies(target_table_infos, db, mappings)
+  manifest = None
+  fingerprints = {}
+  if incremental:
+    if not out:
+      raise click.UsageError('--incremental requires --out')
+    manifest = Manifest.read(out)
+    changed_table_infos = []
+    for target_table_info in target_table_infos:
+      table_name = '{schema}.{table}'.format(**target_table_info)
       try:
         target_table = db[target_table_info['schema']][target_table_info['table']]
-        if verbose:
-          click.secho(str(target_table), file=sys.stderr, fg='cyan')
-        if target_table.table_type in ['hub', 'link', 'satellite']:
-          target_table.check()
-          mappings.check(target_table)
-          render_results = templates.render(target_table, mappings)
-          for (relative_path, sql) in render_results:
-            if out:
-              outpath = Path(out) / relative_path
-              click.secho(str(outpath), file=sys.stderr, fg='green')
-              with open(outpath, 'w') as outfile:
-                outfile.write(sql)
-            else:
-              print(sql)
-        else:
-          click.secho('Unknown table type: {}'.format(target_table), file=sys.stderr, fg='yellow')
-      except MetaDataError as e:
-          click.secho("Meta data error: {}".format(e), file=sys.stderr, fg='red')
-          # break
-      except MetaDataWarning as e:
-          click.secho("Meta data warning: {}".format(e), file=sys.stderr, fg='yellow')
+      except KeyError:
+        changed_table_infos.append(target_table_info)
+        continue
+      with timings.phase('fingerprint', table_name):
+        fingerprints[table_name] = table_fingerprint(target_table, mappings, templates)
+      if manifest.is_current(table_name, fingerprints[table_name]):
+        for output_path in manifest.tables[table_name]['outputs']:
+          writer.keep(output_path)
+      else:
+        changed_table_infos.append(target_table_info)
+    if verbose:
+      click.secho('Unchanged target tables: {}'.format(len(target_table_infos) - len(changed_table_infos)), file=sys.stderr, fg='cyan')
+    target_table_infos = changed_table_infos
+
+  def output(target_table_info, render_results, messages, table_timings, in_worker=False):
+    table_name = '{schema}.{table}'.format(**target_table_info)
+    timings.merge(table_timings)
+    for (message, color) in messages:
+      click.secho(message, file=sys.stderr, fg=color)
+    for (relative_path, result) in render_results:
+      if bundles:
+        bundles.write_chunks(relative_path, spool_chunks(result))
+      elif writer:
+        if in_worker:
+          writer.record(relative_path, result)
+        outpath = Path(out) / relative_path
+        if result:
+          click.secho(str(outpath), file=sys.stderr, fg='green')
+        elif verbose:
+          click.secho('{} (unchanged)'.format(outpath), file=sys.stderr)
+      else:
+        print_chunks(relative_path, spool_chunks(result))
+    if manifest is not None:
+      if render_results and table_name in fingerprints:
+        manifest.update(table_name, fingerprints[table_name], [path for (path, _) in render_results])
+      else:
+        # Tables with errors are regenerated, and the errors reported, on the next run
+        manifest.remove(table_name)
+
+  if bundles:
+    sink = bundles.write_chunks
+  else:
+    sink = writer.write_chunks if writer else print_chunks
+  try:
+    for schema in watermark_schemas:
+      (template_path, out_path) = templates.watermark_output(schema)
+      written = sink(out_path, templates.generate_template(template_path, schema=schema))
+      if writer and not bundles:
+        if written:
+          click.secho(str(Path(out) / out_path), file=sys.stderr, fg='green')
+        elif verbose:
+          click.secho('{} (unchanged)'.format(Path(out) / out_path), file=sys.stderr)
+
+    if jobs == 1 or len(target_table_infos) <= 1:
+      # Printed and bundled SQL is spooled, and output by output() after the messages of the table
+      table_writer = writer if writer and not bundles else SpoolWriter()
+      for target_table_info in target_table_infos:
+        output(target_table_info, *generate_table(target_table_info, db, mappings, templates, verbose, table_writer))
+      if verbose:
+        click.secho("Mappings cache: hits={}, misses={}, size={}".format(*mappings.cache_info()), file=sys.stderr, fg='cyan')
+    else:
+      if 'fork' in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context('fork')
+      else:
+        context = multiprocessing.get_context()
+      chunksize = max(1, len(target_table_infos) // (jobs * 4))
+      # The bundles are written in the parent to keep the order of the tables
+      worker_out = None if bundles else out
+      with context.Pool(jobs, _init_worker, (db, mappings, templates_args, verbose, worker_out)) as pool:
+        # imap returns the results in the order of the target tables
+        generated = pool.imap(_generate_table_worker, target_table_infos, chunksize)
+        for (target_table_info, generated_table) in zip(target_table_infos, generated):
+          output(target_table_info, *generated_table, in_worker=True)
+  except BaseException:
+    # Leave no partial bundle files behind
+    if bundles:
+      bundles.discard()
+    raise
+  if manifest is not None:
+    manifest.write()
+  if bundles:
+    for (relative_path, written) in bundles.close():
+      outpath = Path(out) / relative_path
+      if written:
+        click.secho(str(outpath), file=sys.stderr, fg='green')
+      elif verbose:
+        click.secho('{} (unchanged)'.format(outpath), file=sys.stderr)
+  if writer:
+    if prune:
+      for path in writer.prune():
+        click.secho('{} (deleted)'.format(path), file=sys.stderr, fg='yellow')
+    click.secho('Files: {}'.format(writer.summary()), file=sys.stderr, fg='cyan')
+  if show_timings:
+    for line in timings.summary():
+      click.secho(line, file=sys.stderr, fg='cyan')
+
+@cli.command()
+@click.option('--metadata', help='The metadata directory', type=click.Path(exists=True), default='metadata', show_default=True)
+@click.option('--dbtype', help='The target database type', default='standard', show_default=True)
+@click.option('--format', 'schedule_format', help='The format of the schedule', type=click.Choice(['json', 'make']), default='json', show_default=True)
+@click.option('--out', help='Output file, stdout if not given', type=click.Path(dir_okay=False))
+@click.option('--read-jobs', help='Number of threads reading the metadata files', type=click.IntRange(min=1), default=4, show_default=True)
+@click.option('--snapshot/--no-snapshot', help='Cache the parsed metadata in the user cache directory', default=True, show_default=True)
+def generate_schedule(metadata, dbtype, schedule_format, out, read_jobs, snapshot):
+  """Generate a schedule of the load scripts ordered on dependencies
+
+  The load scripts are grouped in levels, where the scripts in a level only
+  depend on scripts in earlier levels and can run concurrently.
+  """
+  metadata_path = Path(metadata)
+  snapshot_path = default_snapshot_path(metadata_path) if snapshot else None
+  db, tm, cm, target_table_infos = load_metadata(metadata_path, snapshot_path, read_jobs)
+  tables = [table for schema in db.schemas.values() for table in schema.tables.values()]
+  mappings = Mappings(tm, cm, tables + cm.source_tables())
+  target_tables = []
+  for info in target_table_infos:
+    if info['generate'] != 'true':
+      continue
+    try:
+      target_tables.append(db[info['schema']][info['table']])
+    except KeyError:
+      click.secho('Missing table def: {schema}.{table}'.format(**info), file=sys.stderr, fg='yellow')
+  try:
+    schedule = etl_schedule(target_tables, mappings, Templates(dbtype))
+  except MetaDataError as e:
+    raise click.ClickException(str(e))
+  if schedule_format == 'json':
+    text = json.dumps({'levels': schedule}, indent=2) + '\n'
+  else:
+    text = schedule_makefile(schedule)
+  if out:
+    with open(out, 'w', encoding='utf-8') as out_file:
+      out_file.write(text)
+  else:
+    sys.stdout.write(text)
 
 @cli.group()
 def util():
@@ -159,3 +422,9 @@ def generate_params(mappings, target):
             else:
               print('\t\t{target} <= None'.format(target=column))
 
+@util.command()
+@click.option('--dbtype', help='The target database type', default='standard', show_default=True)
+@click.option('--out', help='The directory to compile to', type=click.Path(file_okay=False), required=True)
+def compile_templates(dbtype, out):
+  """Precompile the templates for a dbtype"""
+  Templates(dbtype).compile(out)
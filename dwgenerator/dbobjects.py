@@ -1,7 +1,8 @@
-import csv, re
+import csv, functools, re
 from os.path import join
 from pathlib import PurePath, Path
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 
 class MetaDataError(Exception):
     pass
@@ -9,6 +10,34 @@ class MetaDataError(Exception):
 class MetaDataWarning(Warning):
     pass
 
+def read_files(read, paths, max_workers=None):
+  """Call read for each path, sorted by path, and return the results in that order.
+
+  With max_workers > 1 the files are read in a thread pool, which hides the latency
+  of opening many small files on network file systems.
+  """
+  paths = sorted(paths)
+  if max_workers and max_workers > 1 and len(paths) > 1:
+    with ThreadPoolExecutor(max_workers) as executor:
+      return list(executor.map(read, paths))
+  else:
+    return [read(path) for path in paths]
+
+def column_role(method):
+  """Property for columns with a role in the table, e.g. the business keys of a hub.
+
+  The value is computed once and cached until the columns of the table are set.
+  """
+  name = method.__name__
+  @functools.wraps(method)
+  def get_role(self):
+    try:
+      return self._column_roles[name]
+    except KeyError:
+      value = self._column_roles[name] = method(self)
+      return value
+  return property(get_role)
+
 class Column:
   """Class that describes a column in a DB table."""
   def __init__(self, name, type_, parent=None):
@@ -112,6 +141,32 @@ class Table:
   def full_name(self):
     return "{}.{}".format(self.schema, self.name)
 
+  @property
+  def columns(self):
+    return self._columns
+
+  @columns.setter
+  def columns(self, columns):
+    # Index the columns on name for __getitem__. Assign a new list to columns,
+    # instead of changing the list in place, to keep the index in sync.
+    self._columns = columns
+    self._column_roles = {}
+    self._column_dict = {}
+    for column in columns:
+      self._column_dict.setdefault(column.name, column)
+
+  def set_default_properties(self, **defaults):
+    """Set properties that are not set in the table def, e.g. global settings."""
+    for (name, value) in defaults.items():
+      self.properties.setdefault(name, value)
+    # The column roles may depend on the properties
+    self._column_roles = {}
+
+  @property
+  def generated_columns(self):
+    """The columns that are computed by the templates, and not mapped from the source tables."""
+    return []
+
   def referred_tables(self):
     return [fk.foreign_table for fk in self.fks]
 
@@ -122,10 +177,7 @@ class Table:
     return "{}({})".format(self.full_name, ", ".join(str(c) for c in self.columns))
 
   def __getitem__(self, column_name):
-    try:
-      return [column for column in self.columns if column.name == column_name][0]
-    except IndexError:
-      return None
+    return self._column_dict.get(column_name)
 
   def print_table(self):
     for column in self.columns:
@@ -148,13 +200,13 @@ class Schema:
 
 
   @classmethod
-  def read(cls, path):
+  def read(cls, path, max_workers=None):
     schema = path.stem
     table_paths = path.glob('*.csv')
-    tables = [
-      create_typed_table(Table.read(table_path))
-      for table_path in table_paths
-    ]
+    tables = read_files(
+      lambda table_path: create_typed_table(Table.read(table_path)),
+      table_paths, max_workers
+    )
     return Schema(schema, tables, path)
 
   def __str__(self):
@@ -175,10 +227,10 @@ class DB:
       schema.parent = self
 
   @classmethod
-  def read(cls, path):
-    schema_paths = [d for d in path.iterdir() if d.is_dir()]
+  def read(cls, path, max_workers=None):
+    schema_paths = sorted(d for d in path.iterdir() if d.is_dir())
     schemas = [
-      Schema.read(schema_path)
+      Schema.read(schema_path, max_workers)
       for schema_path in schema_paths
     ]
     return DB(schemas, path)
@@ -198,9 +250,42 @@ class DataVaultObject(Table):
   load_dts_name = 'load_dts'
   rec_src_name = 'rec_src'
   column_role_names = [load_dts_name, rec_src_name]
+  # mapping: the keys are mapped from the source tables, md5 or sha1: the keys are hashes of the business keys
+  key_strategies = ['mapping', 'md5', 'sha1']
+  # insert: INSERT ... SELECT ... WHERE NOT EXISTS, merge: MERGE ... WHEN NOT MATCHED THEN INSERT
+  load_strategies = ['insert', 'merge']
+  # inline: the source tables are read in the union of the select, cte: each source table is read in a CTE
+  source_styles = ['inline', 'cte']
   def __init__(self, table):
     super().__init__(table.schema, table.name, table.columns, table.path, **table.properties)
 
+  @property
+  def key_strategy(self):
+    return self.properties.get('key_strategy', 'mapping').lower()
+
+  @property
+  def hash_keys(self):
+    return self.key_strategy != 'mapping'
+
+  @property
+  def load_strategy(self):
+    return self.properties.get('load_strategy', 'insert').lower()
+
+  @property
+  def source_style(self):
+    return self.properties.get('source_style', 'inline').lower()
+
+  # Used in the table DDL of the dbtypes that support it. An empty property turns the default off.
+  default_cluster_by = None
+
+  @property
+  def cluster_by(self):
+    return self.properties.get('cluster_by', self.default_cluster_by)
+
+  @property
+  def partition_by(self):
+    return self.properties.get('partition_by')
+
   @property
   def load_dts(self):
     return self[self.load_dts_name]
@@ -220,6 +305,18 @@ class DataVaultObject(Table):
         raise MetaDataError('{table} is a {type} and must have at lest one {column_name} column'.format(
           table=self.full_name, type=self.table_type, column_name=column_name
         ))
+    if self.key_strategy not in self.key_strategies:
+      raise MetaDataError('{table} has an unknown key_strategy={key_strategy}, it should be one of {key_strategies}'.format(
+        table=self.full_name, key_strategy=self.key_strategy, key_strategies=', '.join(self.key_strategies)
+      ))
+    if self.load_strategy not in self.load_strategies:
+      raise MetaDataError('{table} has an unknown load_strategy={load_strategy}, it should be one of {load_strategies}'.format(
+        table=self.full_name, load_strategy=self.load_strategy, load_strategies=', '.join(self.load_strategies)
+      ))
+    if self.source_style not in self.source_styles:
+      raise MetaDataError('{table} has an unknown source_style={source_style}, it should be one of {source_styles}'.format(
+        table=self.full_name, source_style=self.source_style, source_styles=', '.join(self.source_styles)
+      ))
 
 class Hub(DataVaultObject):
   table_type = 'hub'
@@ -234,13 +331,21 @@ class Hub(DataVaultObject):
   def key(self):
     return self[self.key_name]
 
-  @property
+  @column_role
   def business_keys(self):
     return [
       c for c in self.columns 
       if c.name not in set([self.key_name, self.load_dts_name, self.rec_src_name])
     ]
 
+  @property
+  def generated_columns(self):
+    return [self.key] if self.hash_keys else []
+
+  @property
+  def default_cluster_by(self):
+    return self.key_name
+
   @property
   def related_links(self):
     return [
@@ -280,10 +385,18 @@ class Link(DataVaultObject):
   def root_key(self):
     return self[self.root_key_name]
 
-  @property
+  @column_role
   def keys(self):
     return [c for c in self.columns if c.name.endswith('_key') and c.name != self.root_key_name]
 
+  @property
+  def generated_columns(self):
+    return [self.root_key] if self.hash_keys else []
+
+  @property
+  def default_cluster_by(self):
+    return self.root_key_name
+
   @property
   def related_hubs(self):
     return [
@@ -311,6 +424,10 @@ class Satellite(DataVaultObject):
   table_type='satellite'
   column_role_names = DataVaultObject.column_role_names + ['key', 'attributes']
   effective_ts_name = 'effective_ts'
+  hash_diff_name = 'hash_diff'
+  # history: a loaded version is new if it differs from all versions in the satellite,
+  # latest: if it differs from the latest version of the key
+  compare_to_options = ['history', 'latest']
   def __init__(self, table):
     super().__init__(table)
     if self.key is None:
@@ -325,27 +442,73 @@ class Satellite(DataVaultObject):
         [self.key.name]
       )]
 
-  @property
+  @column_role
   def key(self):
     try:
       return [c for c in self.columns if c.name.endswith('_key')][0]
     except IndexError:
       return None
 
-  @property
+  @column_role
   def attributes(self):
     return [
       c for c in self.columns
       if c.name not in set([
         self.key.name if self.key else None,
+        self.hash_diff.name if self.hash_diff else None,
         self.load_dts_name, self.rec_src_name
       ])
     ]
 
+  @column_role
+  def hash_diff(self):
+    # Optional, a hash of the attributes that is compared instead of the attributes
+    return self[self.properties.get('hash_diff', self.hash_diff_name).lower()]
+
+  @property
+  def generated_columns(self):
+    return [self.hash_diff] if self.hash_diff else []
+
+  @property
+  def default_cluster_by(self):
+    return self.key.name if self.key else None
+
   @property
   def effective_ts(self):
     return self[self.effective_ts_name]
 
+  @property
+  def compare_to(self):
+    return self.properties.get('compare_to', 'history').lower()
+
+  @property
+  def effectivity_table(self):
+    # Optional, a table with the effectivity range of each version that is loaded together with the satellite
+    if self.properties.get('effectivity_table', 'false').lower() == 'true':
+      return EffectivityTable(self)
+    return None
+
+  def check(self):
+    super().check()
+    if self.compare_to not in self.compare_to_options:
+      raise MetaDataError('{table} has an unknown compare_to={compare_to}, it should be one of {options}'.format(
+        table=self.full_name, compare_to=self.compare_to, options=', '.join(self.compare_to_options)
+      ))
+    effectivity_table = self.properties.get('effectivity_table', 'false').lower()
+    if effectivity_table not in ['true', 'false']:
+      raise MetaDataError('{table} has effectivity_table={value}, it should be true or false'.format(
+        table=self.full_name, value=effectivity_table
+      ))
+    if effectivity_table == 'true':
+      if self.effective_ts is None:
+        raise MetaDataError('{table} must have an {column_name} column to have an effectivity table'.format(
+          table=self.full_name, column_name=self.effective_ts_name
+        ))
+      if self.properties['generate_type'] not in ['table', 'incremental']:
+        raise MetaDataError('{table} must be generated as a table to have an effectivity table'.format(
+          table=self.full_name
+        ))
+
   @property
   def related_hub(self):
     return [
@@ -369,6 +532,47 @@ class Satellite(DataVaultObject):
       rec_src=self.rec_src,
     )
 
+class EffectivityTable(Table):
+  """The effectivity ranges of the versions of a satellite.
+
+  A version is effective from its effective_ts until the effective_ts of the
+  next version of the key, as computed with lead() in the version pointers.
+  """
+  table_type = 'effectivity'
+  effective_ts_end_name = 'effective_ts_end'
+  def __init__(self, satellite):
+    super().__init__(satellite.schema, satellite.name + '_eff', [
+      Column(satellite.key.name, satellite.key.type),
+      Column(satellite.load_dts.name, satellite.load_dts.type),
+      Column(satellite.effective_ts.name, satellite.effective_ts.type),
+      Column(self.effective_ts_end_name, satellite.effective_ts.type),
+    ], generate_type='table')
+    self.satellite = satellite
+    self.pk = [self.key, self.load_dts]
+
+  @property
+  def key(self):
+    return self.columns[0]
+
+  @property
+  def load_dts(self):
+    return self.columns[1]
+
+  @property
+  def effective_ts(self):
+    return self.columns[2]
+
+  @property
+  def effective_ts_end(self):
+    return self.columns[3]
+
+  # The ranges are looked up on the key
+  partition_by = ''
+
+  @property
+  def cluster_by(self):
+    return self.key.name
+
 class VersionPointer(DataVaultObject):
   table_type='version_pointer'
   column_role_names = [
@@ -378,21 +582,21 @@ class VersionPointer(DataVaultObject):
   def __init__(self, table):
     super().__init__(table)
 
-  @property
+  @column_role
   def metrics_key(self):
     try:
       return [c for c in self.columns if c.name.endswith('_key')][0]
     except IndexError:
       return None
 
-  @property
+  @column_role
   def context_key(self):
     try:
       return [c for c in self.columns if c.name.endswith('_key')][1]
     except IndexError:
       return None
 
-  @property
+  @column_role
   def context_load_dts(self):
     try:
       return [c for c in self.columns if c.name.endswith('_load_dts')][0]
@@ -0,0 +1,113 @@
+from .dbobjects import MetaDataError
+
+# Tables of the same dependency level are ordered on type, so that hubs come before links, satellites and version pointers
+TABLE_TYPE_ORDER = ['hub', 'link', 'satellite', 'version_pointer']
+
+# The table types that generate-view renders load scripts for, version pointers are always views
+ETL_TABLE_TYPES = ['hub', 'link', 'satellite']
+
+def table_type_rank(table):
+  try:
+    return TABLE_TYPE_ORDER.index(table.table_type)
+  except ValueError:
+    return len(TABLE_TYPE_ORDER)
+
+def table_dependencies(table, mappings=None):
+  """The tables that must be created and loaded before table.
+
+  These are the tables that the foreign keys of the table refer to, and for a
+  version pointer the tables it is mapped from and the tables on its path.
+  """
+  dependencies = []
+  if table.parent:
+    dependencies += [
+      table.parent.tables[fk.foreign_table_name] for fk in table.fks
+      if fk.foreign_table_name in table.parent.tables
+    ]
+  if mappings and table.table_type == 'version_pointer':
+    dependencies += mappings.source_tables(table)
+    try:
+      dependencies += [column.parent for column in mappings.path(table)]
+    except (MetaDataError, KeyError, IndexError, AttributeError):
+      # Errors in the path are reported when the version pointer is generated
+      pass
+  return [dependency for dependency in dependencies if dependency.full_name != table.full_name]
+
+def dependency_levels(tables, mappings=None):
+  """Split tables into levels, where each table only depends on tables in earlier levels.
+
+  Dependencies on tables that are not among tables are ignored. The tables in a
+  level are ordered on type and name.
+  """
+  tables = {table.full_name: table for table in tables}
+  dependencies = {
+    name: set(d.full_name for d in table_dependencies(table, mappings) if d.full_name in tables)
+    for (name, table) in tables.items()
+  }
+  # The tables that depend on each table, i.e. Schema.referring_tables extended with the version pointers
+  dependents = {name: [] for name in tables}
+  for (name, names) in dependencies.items():
+    for dependency in names:
+      dependents[dependency].append(name)
+  remaining = {name: len(names) for (name, names) in dependencies.items()}
+  level = [name for (name, count) in remaining.items() if count == 0]
+  levels = []
+  while level:
+    levels.append(sorted((tables[name] for name in level), key=lambda t: (table_type_rank(t), t.full_name)))
+    next_level = []
+    for name in level:
+      del remaining[name]
+      for dependent in dependents[name]:
+        remaining[dependent] -= 1
+        if remaining[dependent] == 0:
+          next_level.append(dependent)
+    level = next_level
+  if remaining:
+    raise MetaDataError('Circular dependencies between {}'.format(', '.join(sorted(remaining))))
+  return levels
+
+def dependency_order(tables, mappings=None):
+  """The tables ordered so that each table comes after the tables it depends on."""
+  return [table for level in dependency_levels(tables, mappings) for table in level]
+
+def etl_schedule(tables, mappings, templates):
+  """The load scripts of the hubs, links and satellites that are generated as (incremental) tables, as levels of scripts that can run concurrently.
+
+  Each script is a dict with the table, the path of its load script and the tables it depends on.
+  """
+  etl_tables = [
+    table for table in tables
+    if table.table_type in ETL_TABLE_TYPES and table.properties['generate_type'] in ['table', 'incremental']
+  ]
+  etl_table_names = set(table.full_name for table in etl_tables)
+  return [
+    [
+      {
+        'table': table.full_name,
+        'script': templates.outputs(table)[-1][1].as_posix(),
+        'depends_on': sorted(set(
+          dependency.full_name for dependency in table_dependencies(table, mappings)
+          if dependency.full_name in etl_table_names
+        )),
+      }
+      for table in level
+    ]
+    for level in dependency_levels(etl_tables, mappings)
+  ]
+
+def schedule_makefile(schedule):
+  """A Makefile with a target for each load script, run e.g. with $ make -j 8 SQL='snowsql -f'"""
+  scripts = [script for level in schedule for script in level]
+  lines = [
+    '# Load scripts ordered on dependencies, scripts in the same level can run concurrently.',
+    'SQL ?= echo',
+    '',
+    '.PHONY: all {}'.format(' '.join(script['table'] for script in scripts)),
+    'all: {}'.format(' '.join(script['table'] for script in scripts)),
+  ]
+  for (i, level) in enumerate(schedule):
+    lines += ['', f'# Level {i}']
+    for script in level:
+      lines.append('{}:{}'.format(script['table'], ''.join(' ' + d for d in script['depends_on'])))
+      lines.append('\t$(SQL) {}'.format(script['script']))
+  return '\n'.join(lines) + '\n'
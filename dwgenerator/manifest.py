@@ -0,0 +1,84 @@
+import hashlib, json
+from pathlib import Path
+
+from .dbobjects import Link
+from .dependencies import table_dependencies
+
+MANIFEST_NAME = '.dwgenerator-manifest.json'
+MANIFEST_VERSION = 1
+
+def table_fingerprint(target_table, mappings, templates):
+  """Hash of everything the generated code for a target table is rendered from.
+
+  That is the table defs and properties of the target table and of the tables the
+  templates read, the table and column mappings to the target table, and the
+  templates for the dbtype.
+  """
+  sha = hashlib.sha256()
+  def update(value):
+    sha.update(json.dumps(value, sort_keys=True).encode('utf-8'))
+    sha.update(b'\0')
+
+  update([templates.dbtype, templates.fingerprint()])
+  for table in rendered_tables(target_table, mappings):
+    update(table.full_name)
+    # The properties can also be set as defaults on the command line
+    update(table.properties)
+    if table.path:
+      sha.update(Path(table.path).read_bytes())
+  update(mappings.table_mappings.to_table(target_table.schema, target_table.name))
+  update(mappings.column_mappings.to_table(target_table.schema, target_table.name))
+  return sha.hexdigest()
+
+def rendered_tables(target_table, mappings):
+  """The target table and the tables that the templates read the table defs of for it.
+
+  These are the source tables and the tables the target table depends on, e.g.
+  the tables on the path of a version pointer, and the satellites of the links.
+  """
+  tables = [target_table] + mappings.source_tables(target_table) + table_dependencies(target_table, mappings)
+  tables += [
+    link_satellite for table in tables if isinstance(table, Link) and table.parent
+    for link_satellite in table.related_link_satellites
+  ]
+  return list({table.full_name: table for table in tables}.values())
+
+class Manifest:
+  """The fingerprints and output files of the target tables generated into a directory."""
+  def __init__(self, path, tables=None):
+    self.path = Path(path)
+    self.tables = tables or {}
+
+  @classmethod
+  def read(cls, out_path):
+    path = Path(out_path) / MANIFEST_NAME
+    try:
+      with open(path, encoding='utf-8') as manifest_file:
+        manifest = json.load(manifest_file)
+    except (FileNotFoundError, ValueError):
+      return cls(path)
+    if manifest.get('version') != MANIFEST_VERSION:
+      return cls(path)
+    return cls(path, manifest['tables'])
+
+  def write(self):
+    with open(self.path, 'w', encoding='utf-8') as manifest_file:
+      json.dump({'version': MANIFEST_VERSION, 'tables': self.tables}, manifest_file, indent=2, sort_keys=True)
+
+  def is_current(self, table_name, fingerprint):
+    """True if the table was generated from the same inputs and its output files still exist."""
+    entry = self.tables.get(table_name)
+    return (
+      entry is not None
+      and entry['fingerprint'] == fingerprint
+      and all((self.path.parent / output).exists() for output in entry['outputs'])
+    )
+
+  def update(self, table_name, fingerprint, outputs):
+    self.tables[table_name] = {
+      'fingerprint': fingerprint,
+      'outputs': [Path(output).as_posix() for output in outputs],
+    }
+
+  def remove(self, table_name):
+    self.tables.pop(table_name, None)
@@ -2,80 +2,93 @@ import csv, re
 from os import path
 from pathlib import Path
 from itertools import groupby
-from .dbobjects import Column, Table, Schema, create_typed_table, MetaDataError, MetaDataWarning
+from collections import defaultdict, namedtuple
+from .dbobjects import Column, Table, Schema, create_typed_table, read_files, MetaDataError, MetaDataWarning
 
 TRANSFORM_PARAM_RE = re.compile(r"\$(\d+)")
 
-class TableMappings(list):
+CacheInfo = namedtuple('CacheInfo', 'hits misses currsize')
+
+class IndexedMappings(list):
+  """A list of mapping rows with lazily built hash indexes on the row fields.
+
+  Each index maps a tuple of field values to the rows having those values, so
+  filtering on a table or column is a dict lookup instead of a scan of all rows.
+  """
+  def __init__(self, mappings):
+    super().__init__(mappings)
+    self._indexes = {}
+
+  def index(self, *fields):
+    try:
+      return self._indexes[fields]
+    except KeyError:
+      index = defaultdict(list)
+      for mapping in self:
+        index[tuple(mapping[field] for field in fields)].append(mapping)
+      self._indexes[fields] = index
+      return index
+
+  def lookup(self, fields, values):
+    return self.__class__(self.index(*fields).get(values, []))
+
+
+class TableMappings(IndexedMappings):
   def __init__(self, table_mappings):
     super().__init__(table_mappings)
 
   @classmethod
-  def read(cls, path):
+  def read(cls, path, max_workers=None):
+    def read_file(path):
+      with open(path, encoding='utf-8') as mappings_file:
+        return list(csv.DictReader(mappings_file, delimiter=','))
     paths = Path(path).glob('*.csv')
     table_mappings = []
-    for path in paths:
-      with open(path, encoding='utf-8') as mappings_file:
-        table_mappings += list(csv.DictReader(mappings_file, delimiter=','))
+    for file_mappings in read_files(read_file, paths, max_workers):
+      table_mappings += file_mappings
     return TableMappings(table_mappings)
 
   def from_table(self, schema, table):
-    return TableMappings([
-      mapping for mapping in self
-      if mapping['source_schema'] == schema and mapping['source_table'] == table
-    ])
+    return self.lookup(('source_schema', 'source_table'), (schema, table))
 
   def to_table(self, schema, table):
-    return TableMappings([
-      mapping for mapping in self
-      if mapping['target_schema'] == schema and mapping['target_table'] == table
-    ])
+    return self.lookup(('target_schema', 'target_table'), (schema, table))
 
   def print_mappings(self):
     for mapping in self:
       print('{source_schema}.{source_table}\t{source_filter}\t{target_schema}.{target_table}'.format(**mapping))
 
 
-class ColumnMappings(list):
+class ColumnMappings(IndexedMappings):
   def __init__(self, column_mappings):
     super().__init__(column_mappings)
 
   @classmethod
-  def read(cls, path):
+  def read(cls, path, max_workers=None):
+    def read_file(path):
+      with open(path, encoding='utf-8') as mappings_file:
+        return [m for m in csv.DictReader(mappings_file, dialect=csv.excel) if not m['src_schema'].startswith('--')]
     paths = Path(path).glob('*.csv')
     column_mappings = []
-    for path in paths:
-      with open(path, encoding='utf-8') as mappings_file:
-        column_mappings += [m for m in csv.DictReader(mappings_file, dialect=csv.excel) if not m['src_schema'].startswith('--')]
+    for file_mappings in read_files(read_file, paths, max_workers):
+      column_mappings += file_mappings
     return ColumnMappings(column_mappings)
 
   def from_table(self, schema, table):
-    return ColumnMappings([
-      mapping for mapping in self
-      if mapping['src_schema'] == schema and mapping['src_table'] == table
-    ])
+    return self.lookup(('src_schema', 'src_table'), (schema, table))
 
   def to_table(self, schema, table):
-    return ColumnMappings([
-      mapping for mapping in self 
-      if mapping['tgt_schema'] == schema and mapping['tgt_table'] == table
-    ])
+    return self.lookup(('tgt_schema', 'tgt_table'), (schema, table))
 
   def from_column(self, schema, table, column):
-    return ColumnMappings([
-      mapping for mapping in self 
-      if mapping['src_schema'] == schema and mapping['src_table'] == table and mapping['src_column'] == column
-    ])
+    return self.lookup(('src_schema', 'src_table', 'src_column'), (schema, table, column))
 
   def to_column(self, schema=None, table=None, column=None):
     if isinstance(column, Column):
       schema = column.parent.schema
       table = column.parent.name
       column = column.name
-    return ColumnMappings([
-      mapping for mapping in self 
-      if mapping['tgt_schema'] == schema and mapping['tgt_table'] == table and mapping['tgt_column'] == column
-    ])
+    return self.lookup(('tgt_schema', 'tgt_table', 'tgt_column'), (schema, table, column))
 
   def to_column_list(self, column):
     column_mappings = self.to_column(column.parent.schema, column.parent.name, column.name)
@@ -123,14 +136,79 @@ def apply_transform(column_names, transform, prefix):
   else:
     return ';'.join(column_names)
 
+def _referred_table(key):
+  """The table in the same schema that a key column refers to with a foreign key, if it is there."""
+  schema = key.parent.parent
+  for fk in key.parent.fks:
+    if key.name in fk.column_names and schema is not None and fk.foreign_table_name in schema.tables:
+      return fk.foreign_table
+  return None
+
 class Mappings:
+  """Mapping queries used by the templates.
+
+  The results of the queries are memoized, as the templates and check() ask the
+  same questions many times for each target table. The cache is cleared when the
+  table mappings, column mappings or tables are replaced, or by clear_cache().
+  """
   def __init__(self, table_mappings, column_mappings, tables):
+    self._cache = {}
+    self._hits = 0
+    self._misses = 0
     self.table_mappings = table_mappings
     self.column_mappings = column_mappings
     self.tables = tables
+
+  @property
+  def table_mappings(self):
+    return self._table_mappings
+
+  @table_mappings.setter
+  def table_mappings(self, table_mappings):
+    self._table_mappings = table_mappings
+    self.clear_cache()
+
+  @property
+  def column_mappings(self):
+    return self._column_mappings
+
+  @column_mappings.setter
+  def column_mappings(self, column_mappings):
+    self._column_mappings = column_mappings
+    self.clear_cache()
+
+  @property
+  def tables(self):
+    return self._tables
+
+  @tables.setter
+  def tables(self, tables):
+    self._tables = tables
     self._table_dict = dict((table.full_name, table) for table in tables)
+    self.clear_cache()
+
+  def clear_cache(self):
+    self._cache.clear()
+
+  def cache_info(self):
+    return CacheInfo(self._hits, self._misses, len(self._cache))
+
+  def _cached(self, key, compute):
+    try:
+      result = self._cache[key]
+      self._hits += 1
+    except KeyError:
+      self._misses += 1
+      result = self._cache[key] = compute()
+    return result
 
   def source_tables(self, target_table):
+    return list(self._cached(
+      ('source_tables', target_table.full_name),
+      lambda: self._source_tables(target_table)
+    ))
+
+  def _source_tables(self, target_table):
     source_mappings = self.table_mappings.to_table(target_table.schema, target_table.name)
     source_table_names = ['{source_schema}.{source_table}'.format(**m) for m in source_mappings]
     source_tables = [self._table_dict.get(table_name) for table_name in source_table_names]
@@ -144,9 +222,15 @@ class Mappings:
       return None
 
   def filter(self, source_table, target_table):
+    return self._cached(
+      ('filter', source_table.full_name, target_table.full_name),
+      lambda: self._filter(source_table, target_table)
+    )
+
+  def _filter(self, source_table, target_table):
     mappings = (self.table_mappings
-                .from_table(source_table.schema, source_table.name)
                 .to_table(target_table.schema, target_table.name)
+                .from_table(source_table.schema, source_table.name)
                 )
     try:
       return mappings[0]['source_filter']
@@ -155,21 +239,24 @@ class Mappings:
 
   def source_columns(self, source_table, target_column, prefix=None):
     if target_column:
-      target_table = target_column.parent
-      source_column_mappings = self.column_mappings.to_table(target_table.schema, target_table.name)
-      if source_table:
-        target_column_mappings = source_column_mappings.from_table(source_table.schema, source_table.name)
-      else:
-        target_column_mappings = source_column_mappings
-      source_maps = target_column_mappings.to_column_list(target_column)
-      result = [
-        apply_transform(source_map['source'].split(';'), source_map['transformation'], prefix)
-        for source_map in source_maps
-      ]
-      return result
+      return list(self._cached(
+        ('source_columns', source_table.full_name if source_table else None, target_column.full_name, prefix),
+        lambda: self._source_columns(source_table, target_column, prefix)
+      ))
     else:
       return []
 
+  def _source_columns(self, source_table, target_column, prefix):
+    target_column_mappings = self.column_mappings.to_column(column=target_column)
+    if source_table:
+      target_column_mappings = target_column_mappings.from_table(source_table.schema, source_table.name)
+    source_maps = target_column_mappings.to_column_list(target_column)
+    result = [
+      apply_transform(source_map['source'].split(';'), source_map['transformation'], prefix)
+      for source_map in source_maps
+    ]
+    return result
+
   def source_column(self, source_table, target_column, prefix=None):
     source_columns = self.source_columns(source_table, target_column, prefix)
     if len(source_columns) > 0:
@@ -177,7 +264,77 @@ class Mappings:
     else:
       return None
 
+  def key_source_columns(self, source_table, key):
+    """The source columns that a hashed key of a link or satellite is the hash of.
+
+    They are ordered as the business keys of the hub or link that the key refers to,
+    so that the hash matches the key of that table and does not depend on the order
+    of the column mappings. A source column is matched to a business key if the
+    source table maps it to the business key of the hub too, or else if it has the
+    name of the business key. Raises a MetaDataError if a key of several columns
+    cannot be ordered that way.
+    """
+    return list(self._cached(
+      ('key_source_columns', source_table.full_name, key.full_name),
+      lambda: self._key_source_columns(source_table, key)
+    ))
+
+  def _key_source_columns(self, source_table, key):
+    source_columns = self.source_columns(source_table, key)
+    if len(source_columns) <= 1:
+      return source_columns
+    referred_table = _referred_table(key)
+    if referred_table is None:
+      raise MetaDataError('The source columns of {key} from {source_table} cannot be ordered, as the table it refers to is missing'.format(
+        key=key.full_name, source_table=source_table.full_name
+      ))
+    ordered_columns = []
+    for (business_key, business_key_column) in self._business_key_columns(source_table, referred_table):
+      matches = [
+        column for column in source_columns
+        if column not in ordered_columns and column in (business_key_column, business_key.name)
+      ]
+      if not matches:
+        raise MetaDataError('No source column of {key} from {source_table} matches the business key {business_key}, map it from a column with that name or map the business key from {source_table} too'.format(
+          key=key.full_name, source_table=source_table.full_name, business_key=business_key.full_name
+        ))
+      ordered_columns.append(matches[0])
+    if len(ordered_columns) != len(source_columns):
+      raise MetaDataError('{key} has {count} source columns from {source_table}, but {referred_table} has {business_key_count} business keys'.format(
+        key=key.full_name, count=len(source_columns), source_table=source_table.full_name,
+        referred_table=referred_table.full_name, business_key_count=len(ordered_columns)
+      ))
+    return ordered_columns
+
+  def _business_key_columns(self, source_table, table):
+    # The (business key, source column mapped from source_table or None) pairs that the hashed key of a hub or link is the hash of
+    if table.table_type == 'hub':
+      return [(business_key, self.source_column(source_table, business_key)) for business_key in table.business_keys]
+    business_key_columns = []
+    for link_key in table.keys:
+      hub = _referred_table(link_key)
+      if hub is None:
+        raise MetaDataError('The business keys of {key} cannot be found, as the hub it refers to is missing'.format(key=link_key.full_name))
+      link_key_columns = self.source_columns(source_table, link_key)
+      if len(link_key_columns) == len(hub.business_keys):
+        link_key_columns = self.key_source_columns(source_table, link_key)
+      else:
+        link_key_columns = [None] * len(hub.business_keys)
+      business_key_columns.extend(zip(hub.business_keys, link_key_columns))
+    return business_key_columns
+
+  def is_plain_column(self, source_table, target_column):
+    """True if target_column is mapped from a column of source_table as it is, without a transformation."""
+    source_column = self.source_column(source_table, target_column)
+    return source_column is not None and source_table[source_column] is not None
+
   def source_column_objects(self, target_column, source_table=None):
+    return list(self._cached(
+      ('source_column_objects', target_column.full_name, source_table.full_name if source_table else None),
+      lambda: self._source_column_objects(target_column, source_table)
+    ))
+
+  def _source_column_objects(self, target_column, source_table):
     source_column_mappings = self.column_mappings.to_column(column=target_column)
     if source_table:
       source_column_mappings = source_column_mappings.from_table(source_table.schema, source_table.name)
@@ -208,8 +365,24 @@ class Mappings:
         target_table_name=target_table.full_name,
         source_table_names=', '.join(source_table_names)
       ))
+    if target_table.table_type in ['link', 'satellite']:
+      for fk in target_table.fks:
+        referred_table = _referred_table(fk.columns[0])
+        if referred_table is not None and referred_table.key_strategy != target_table.key_strategy:
+          raise MetaDataError('{table} has key_strategy={key_strategy}, but {referred_table} that it refers to has key_strategy={referred_key_strategy}'.format(
+            table=target_table.full_name, key_strategy=target_table.key_strategy,
+            referred_table=referred_table.full_name, referred_key_strategy=referred_table.key_strategy
+          ))
+      if target_table.hash_keys:
+        keys = target_table.keys if target_table.table_type == 'link' else [target_table.key]
+        for source_table in source_tables:
+          for key in keys:
+            self.key_source_columns(source_table, key)
+    generated_columns = target_table.generated_columns
     for target_column in target_table.columns:
       # print(target_column)
+      if target_column in generated_columns:
+        continue
       if target_table.table_type in ['version_pointer']:
         src_columns = self.column_mappings.to_column(target_table.schema, target_table.name, target_column.name)
         if len(src_columns) < 1:
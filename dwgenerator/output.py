@@ -0,0 +1,212 @@
+import filecmp, locale, os, tempfile
+from pathlib import Path
+
+class OutputWriter:
+  """Writes generated files to an output directory.
+
+  Files whose content would not change are left untouched, so that their mtimes
+  are kept and only real changes show up downstream. The written, unchanged and
+  deleted files are counted.
+  """
+  def __init__(self, out_path):
+    self.out_path = Path(out_path)
+    self.encoding = locale.getpreferredencoding(False)
+    self.written = 0
+    self.unchanged = 0
+    self.deleted = 0
+    self.paths = set()
+
+  def encode(self, text):
+    # Same bytes as open(path, 'w').write(text) would produce
+    if os.linesep != '\n':
+      text = text.replace('\n', os.linesep)
+    return text.encode(self.encoding)
+
+  def write(self, relative_path, text):
+    """Write text to relative_path in the output directory if it differs from the current content.
+
+    Returns True if the file was written.
+    """
+    return self.write_chunks(relative_path, [text])
+
+  def write_chunks(self, relative_path, chunks):
+    """Like write, but the text is an iterable of chunks, e.g. from a Jinja template generator.
+
+    The chunks are streamed to a temporary file that replaces the current file
+    only if the content differs, so the whole text is never held in memory.
+    """
+    with self.open(relative_path) as out_file:
+      for chunk in chunks:
+        out_file.write(chunk)
+    return out_file.written
+
+  def open(self, relative_path):
+    """A file for writing text to relative_path, that is only replaced when closed if the content differs."""
+    return _ChangedFile(self, relative_path)
+
+  def record(self, relative_path, written):
+    """Count a file written to the output directory, e.g. by another process."""
+    self.paths.add(self.out_path / relative_path)
+    if written:
+      self.written += 1
+    else:
+      self.unchanged += 1
+
+  def keep(self, relative_path):
+    """Mark a file that was not regenerated in this run as still being generated."""
+    self.paths.add(self.out_path / relative_path)
+
+  def prune(self):
+    """Delete the .sql files in the output directory that were not generated in this run.
+
+    Returns the deleted paths.
+    """
+    deleted = [
+      path for path in sorted(self.out_path.rglob('*.sql'))
+      if path not in self.paths
+    ]
+    for path in deleted:
+      path.unlink()
+    self.deleted += len(deleted)
+    return deleted
+
+  def summary(self):
+    return 'written={}, unchanged={}, deleted={}'.format(self.written, self.unchanged, self.deleted)
+
+class _ChangedFile:
+  def __init__(self, writer, relative_path):
+    self.writer = writer
+    self.relative_path = relative_path
+    self.path = writer.out_path / relative_path
+    self.path.parent.mkdir(parents=True, exist_ok=True)
+    self.tmp_path = self.path.with_name(f'.{self.path.name}.{os.getpid()}.tmp')
+    self.tmp_file = open(self.tmp_path, 'wb')
+    self.size = 0
+    self.written = None
+
+  def write(self, text):
+    data = self.writer.encode(text)
+    self.tmp_file.write(data)
+    self.size += len(data)
+
+  def truncate(self, size):
+    self.tmp_file.seek(size)
+    self.tmp_file.truncate()
+    self.size = size
+
+  def close(self):
+    self.tmp_file.close()
+    if self.path.exists() and filecmp.cmp(self.tmp_path, self.path, shallow=False):
+      os.remove(self.tmp_path)
+      self.written = False
+    else:
+      os.replace(self.tmp_path, self.path)
+      self.written = True
+    self.writer.record(self.relative_path, self.written)
+    return self.written
+
+  def discard(self):
+    self.tmp_file.close()
+    if self.tmp_path.exists():
+      os.remove(self.tmp_path)
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, exc_type, exc_value, traceback):
+    if exc_type is None:
+      self.close()
+    else:
+      self.discard()
+
+class SpoolWriter:
+  """Writes generated files to temporary spool files, to be copied to their destination later.
+
+  Used when the files are printed or bundled, so that the SQL of a target table can
+  be streamed without being held in memory, and only output when all of it rendered.
+  """
+  def open(self, relative_path):
+    return _SpoolFile()
+
+class _SpoolFile:
+  def __init__(self):
+    self.tmp_file = tempfile.NamedTemporaryFile('w', encoding='utf-8', prefix='dwgenerator-', suffix='.sql', delete=False)
+    self.path = self.tmp_file.name
+
+  def write(self, text):
+    self.tmp_file.write(text)
+
+  def close(self):
+    """Close the spool file and return its path."""
+    self.tmp_file.close()
+    return self.path
+
+  def discard(self):
+    self.tmp_file.close()
+    os.remove(self.path)
+
+def spool_chunks(path, chunk_size=1 << 16):
+  """The text of a spool file as chunks. The spool file is deleted when it has been read."""
+  try:
+    with open(path, encoding='utf-8') as spool_file:
+      for chunk in iter(lambda: spool_file.read(chunk_size), ''):
+        yield chunk
+  finally:
+    os.remove(path)
+
+class BundleWriter:
+  """Concatenates the generated files into a few bundle files, so that they can be deployed in a few executions.
+
+  The files are appended in the order they are written. With by_schema there is a
+  bundle for each schema, and with max_size a new bundle file is started when a
+  bundle has reached max_size bytes. The bundle files are written with an OutputWriter.
+  """
+  def __init__(self, writer, by_schema=False, max_size=None, name='deploy'):
+    self.writer = writer
+    self.by_schema = by_schema
+    self.max_size = max_size
+    self.name = name
+    self.bundles = {}
+    self.paths = []
+
+  def bundle_path(self, schema, part):
+    name = f'{self.name}_{part:03}.sql' if self.max_size else f'{self.name}.sql'
+    return Path(schema) / name if schema else Path(name)
+
+  def write_chunks(self, relative_path, chunks):
+    schema = Path(relative_path).parts[0] if self.by_schema else None
+    (part, bundle) = self.bundles.get(schema, (0, None))
+    if bundle is None or (self.max_size and bundle.size >= self.max_size):
+      if bundle is not None:
+        self._close(bundle)
+      part += 1
+      bundle = self.writer.open(self.bundle_path(schema, part))
+      self.bundles[schema] = (part, bundle)
+    size = bundle.size
+    try:
+      if size:
+        bundle.write('\n')
+      bundle.write(f'-- {Path(relative_path).as_posix()}\n')
+      for chunk in chunks:
+        bundle.write(chunk)
+      bundle.write('\n')
+    except BaseException:
+      # Leave out the file that failed, the rest of the bundle is still valid
+      bundle.truncate(size)
+      raise
+
+  def _close(self, bundle):
+    bundle.close()
+    self.paths.append((bundle.relative_path, bundle.written))
+
+  def close(self):
+    """Close the bundle files and return their (relative path, written) pairs."""
+    for (_, bundle) in self.bundles.values():
+      self._close(bundle)
+    self.bundles = {}
+    return self.paths
+
+  def discard(self):
+    for (_, bundle) in self.bundles.values():
+      bundle.discard()
+    self.bundles = {}
@@ -0,0 +1,101 @@
+import csv, hashlib, os, pickle, tempfile
+from collections import namedtuple
+from pathlib import Path
+
+from .cache import user_cache_dir
+from .dbobjects import DB
+from .mappings import TableMappings, ColumnMappings
+from .timings import Timings
+
+SNAPSHOT_VERSION = 1
+
+Metadata = namedtuple('Metadata', 'db table_mappings column_mappings target_tables')
+
+def read_metadata(metadata_path, max_workers=None, timings=None):
+  """Read the table defs, mappings and target tables in a metadata directory.
+
+  max_workers is the number of threads used for reading the files in each directory.
+  """
+  timings = timings or Timings()
+  metadata_path = Path(metadata_path)
+  mappings_path = metadata_path / 'mapping'
+  with timings.phase('read table mappings'):
+    table_mappings = TableMappings.read(mappings_path / 'table', max_workers)
+  with timings.phase('read column mappings'):
+    column_mappings = ColumnMappings.read(mappings_path / 'column', max_workers)
+  with timings.phase('read target tables'):
+    with open(metadata_path / 'target_tables.csv', encoding='utf-8') as target_tables_file:
+      target_tables = list(csv.DictReader(target_tables_file, dialect=csv.excel))
+  with timings.phase('read table defs'):
+    db = DB.read(metadata_path / 'table_def', max_workers)
+  return Metadata(db, table_mappings, column_mappings, target_tables)
+
+def metadata_files(metadata_path):
+  metadata_path = Path(metadata_path)
+  return (
+    [metadata_path / 'target_tables.csv']
+    + sorted((metadata_path / 'table_def').glob('*/*.csv'))
+    + sorted((metadata_path / 'mapping' / 'table').glob('*.csv'))
+    + sorted((metadata_path / 'mapping' / 'column').glob('*.csv'))
+  )
+
+def _code_fingerprint():
+  # The snapshot contains pickled dwgenerator objects, so it is only valid for the code that created it
+  sha = hashlib.sha256()
+  for module_path in sorted(Path(__file__).parent.glob('*.py')):
+    sha.update(module_path.read_bytes())
+  return sha.hexdigest()
+
+def _snapshot_header(metadata_path):
+  stamps = []
+  for path in metadata_files(metadata_path):
+    stat = path.stat()
+    stamps.append((str(path), stat.st_mtime_ns, stat.st_size))
+  return (SNAPSHOT_VERSION, _code_fingerprint(), stamps)
+
+def default_snapshot_path(metadata_path):
+  key = hashlib.sha256(str(Path(metadata_path).resolve()).encode('utf-8')).hexdigest()[:16]
+  return user_cache_dir('snapshots', f'{key}.pickle')
+
+def _read_snapshot(snapshot_path, header):
+  try:
+    with open(snapshot_path, 'rb') as snapshot_file:
+      if pickle.load(snapshot_file) == header:
+        return pickle.load(snapshot_file)
+  except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError, ValueError):
+    pass
+  return None
+
+def load_metadata(metadata_path, snapshot_path=None, max_workers=None, timings=None):
+  """Read the metadata, using a snapshot of the parsed metadata if it is up to date.
+
+  The snapshot is a pickle of the header, with the modification time and size of
+  every metadata file, followed by the metadata. If the header does not match the
+  files the metadata is read from the files and the snapshot is rewritten.
+  """
+  timings = timings or Timings()
+  if snapshot_path is None:
+    return read_metadata(metadata_path, max_workers, timings)
+  snapshot_path = Path(snapshot_path)
+  with timings.phase('read snapshot'):
+    header = _snapshot_header(metadata_path)
+    metadata = _read_snapshot(snapshot_path, header)
+  if metadata is not None:
+    return metadata
+  metadata = read_metadata(metadata_path, max_workers, timings)
+  try:
+    snapshot_path.parent.mkdir(parents=True, exist_ok=True)
+    # Write to a temporary file and rename it, so that a concurrent run never reads a partial snapshot
+    with tempfile.NamedTemporaryFile('wb', dir=snapshot_path.parent, suffix='.tmp', delete=False) as snapshot_file:
+      try:
+        pickle.dump(header, snapshot_file, pickle.HIGHEST_PROTOCOL)
+        pickle.dump(metadata, snapshot_file, pickle.HIGHEST_PROTOCOL)
+      except BaseException:
+        snapshot_file.close()
+        os.remove(snapshot_file.name)
+        raise
+    os.replace(snapshot_file.name, snapshot_path)
+  except OSError:
+    # Not being able to save the snapshot only makes the next run slower
+    pass
+  return metadata
@@ -1,3 +1,4 @@
+{% from 'table_options.sql' import table_options %}
 {% include 'header.sql' %}
 
 DROP TABLE IF EXISTS {{ target_table.full_name }};
@@ -6,4 +7,4 @@ CREATE TABLE {{ target_table.full_name }} (
   {% for column in target_table.columns %}
   {{ "%-20s" | format(column.name) }} {{ column.type }}{{"," if not loop.last or target_table.pk }}
   {% endfor %}
-);
\ No newline at end of file
+){{ table_options(target_table) }};
\ No newline at end of file
@@ -0,0 +1,8 @@
+{% macro to_string(expression) -%}
+coalesce(cast({{ expression }} AS STRING), '')
+{%- endmacro %}
+
+{# The expressions are strings, e.g. from to_string #}
+{% macro hash(expressions, algorithm='md5') -%}
+{{ algorithm | upper }}({% for expression in expressions %}{{ expression }}{{ " || '|' || " if not loop.last }}{% endfor %})
+{%- endmacro %}
@@ -0,0 +1,27 @@
+{% from 'sources.sql' import source_ctes, hub_sources %}
+{# BigQuery only allows QUALIFY in a select with a WHERE, GROUP BY or HAVING clause #}
+{% if target_table.source_style == 'cte' %}
+{{ source_ctes(target_table, mappings, insert_) -}}
+{% endif %}
+SELECT
+  {{ target_table.key.name }}
+  {% for target_business_key in target_table.business_keys %}
+  ,{{ target_business_key.name }}
+  {% endfor %}
+  ,{{ target_table.load_dts.name }}
+  ,{{ target_table.rec_src.name }}
+FROM (
+  {{ hub_sources(target_table, mappings, insert_) | indent(2) }}
+)
+{% if insert_ and not merge_ %}
+q
+WHERE
+  NOT EXISTS (
+    SELECT 1
+    FROM {{ target_table.full_name }} t
+    WHERE t.{{ target_table.key.name }} = q.{{ target_table.key.name }}
+  )
+{% else %}
+WHERE true
+{% endif %}
+QUALIFY row_number() over(PARTITION BY {{ target_table.key.name }} ORDER BY {{ target_table.load_dts.name }} asc) = 1
@@ -0,0 +1,7 @@
+{# BigQuery only allows QUALIFY in a select with a WHERE, GROUP BY or HAVING clause #}
+{% macro latest_versions(table, key, load_dts) -%}
+SELECT *
+FROM {{ table.full_name }}
+WHERE true
+QUALIFY row_number() over(PARTITION BY {{ key.name }} ORDER BY {{ load_dts.name }} desc) = 1
+{%- endmacro %}
@@ -0,0 +1,27 @@
+{% from 'sources.sql' import source_ctes, link_sources %}
+{# BigQuery only allows QUALIFY in a select with a WHERE, GROUP BY or HAVING clause #}
+{% if target_table.source_style == 'cte' %}
+{{ source_ctes(target_table, mappings, insert_) -}}
+{% endif %}
+SELECT
+  {{ target_table.root_key.name }}
+  {% for key in target_table.keys %}
+  ,{{ key.name }}
+  {% endfor %}
+  ,{{ target_table.load_dts.name }}
+  ,{{ target_table.rec_src.name }}
+FROM (
+  {{ link_sources(target_table, mappings, insert_) | indent(2) }}
+)
+{% if insert_ and not merge_ %}
+q
+WHERE
+  NOT EXISTS (
+    SELECT 1
+    FROM {{ target_table.full_name }} t
+    WHERE t.{{ target_table.root_key.name }} = q.{{ target_table.root_key.name }}
+  )
+{% else %}
+WHERE true
+{% endif %}
+QUALIFY row_number() over(PARTITION BY {{ target_table.root_key.name }} ORDER BY {{ target_table.load_dts.name }} asc) = 1
@@ -0,0 +1,14 @@
+{% macro table_options(target_table) -%}
+{% set partition_by = target_table.partition_by %}
+{% if partition_by is none and target_table.load_dts %}
+{% set partition_by = 'DATE(' ~ target_table.load_dts.name ~ ')' %}
+{% endif %}
+{% if partition_by %}
+
+PARTITION BY {{ partition_by }}
+{%- endif %}
+{% if target_table.cluster_by %}
+
+CLUSTER BY {{ target_table.cluster_by }}
+{%- endif %}
+{%- endmacro %}
@@ -0,0 +1,8 @@
+{% from 'load_window.sql' import watermark_table %}
+{% include 'header.sql' %}
+
+CREATE TABLE IF NOT EXISTS {{ watermark_table(schema) }} (
+  table_name           STRING,
+  load_dts             TIMESTAMP,
+  updated_ts           TIMESTAMP
+);
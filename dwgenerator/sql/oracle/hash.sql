@@ -0,0 +1,9 @@
+{# In Oracle || treats NULL as an empty string, so no coalesce is needed #}
+{% macro to_string(expression) -%}
+to_char({{ expression }})
+{%- endmacro %}
+
+{# The expressions are strings, e.g. from to_string #}
+{% macro hash(expressions, algorithm='md5') -%}
+standard_hash({% for expression in expressions %}{{ expression }}{{ " || '|' || " if not loop.last }}{% endfor %}, '{{ algorithm | upper }}')
+{%- endmacro %}
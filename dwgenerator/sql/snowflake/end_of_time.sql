@@ -0,0 +1,3 @@
+{% macro end_of_time() -%}
+'9999-12-31 23:59:59'::timestamp
+{%- endmacro %}
@@ -0,0 +1,5 @@
+{% macro latest_versions(table, key, load_dts) -%}
+SELECT *
+FROM {{ table.full_name }}
+QUALIFY row_number() over(PARTITION BY {{ key.name }} ORDER BY {{ load_dts.name }} desc) = 1
+{%- endmacro %}
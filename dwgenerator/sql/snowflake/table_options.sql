@@ -0,0 +1,6 @@
+{% macro table_options(target_table) -%}
+{% if target_table.cluster_by %}
+
+CLUSTER BY ({{ target_table.cluster_by }})
+{%- endif %}
+{%- endmacro %}
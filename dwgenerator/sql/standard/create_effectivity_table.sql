@@ -0,0 +1,2 @@
+{% set target_table = target_table.effectivity_table %}
+{% include 'create_table.sql' %}
@@ -0,0 +1,31 @@
+{% include 'header.sql' %}
+
+{% set insert_ = target_table.properties.generate_type in ['table', 'incremental'] %}
+{% set merge_ = true %}
+MERGE INTO {{ target_table.full_name }} t
+USING (
+{% block select %}
+SELECT *
+FROM {{ source_table.full_name }}
+{% endblock +%}
+) s
+ON (
+{% block merge_condition %}
+{% endblock %}
+)
+WHEN NOT MATCHED THEN INSERT (
+  {% for column in target_table.columns %}
+  {{ "," if not loop.first }}{{ column.name }}
+  {% endfor %}
+) VALUES (
+  {% for column in target_table.columns %}
+  {{ "," if not loop.first }}s.{{ column.name }}
+  {% endfor %}
+)
+;
+{%- block post_load %}{% endblock %}
+{%- if target_table.properties.generate_type == 'incremental' %}
+
+
+{% include 'watermark_update.sql' %}
+{% endif %}
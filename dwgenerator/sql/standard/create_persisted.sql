@@ -1,9 +1,15 @@
 {% include 'header.sql' %}
 
-{% set insert_ = target_table.properties.generate_type == 'table' %}
+{% set insert_ = target_table.properties.generate_type in ['table', 'incremental'] %}
 INSERT INTO {{ target_table.full_name }}
 {% block select %}
 SELECT *
 FROM {{ source_table.full_name }}
 {% endblock %}
 ;
+{%- block post_load %}{% endblock %}
+{%- if target_table.properties.generate_type == 'incremental' %}
+
+
+{% include 'watermark_update.sql' %}
+{% endif %}
@@ -1,3 +1,4 @@
+{% from 'table_options.sql' import table_options %}
 {% include 'header.sql' %}
 
 DROP TABLE IF EXISTS {{ target_table.full_name }};
@@ -9,4 +10,4 @@ CREATE TABLE {{ target_table.full_name }} (
   {% if target_table.pk %}
   CONSTRAINT pk_{{ target_table.name }} PRIMARY KEY ({% for pk in target_table.pk %}{{ pk.name }}{{", " if not loop.last }}{% endfor %})
   {% endif %}
-);
\ No newline at end of file
+){{ table_options(target_table) }};
\ No newline at end of file
@@ -0,0 +1,37 @@
+{% from 'end_of_time.sql' import end_of_time %}
+{% from 'load_window.sql' import load_window %}
+{% set eff = target_table.effectivity_table %}
+{# Only the keys with versions loaded by this run are candidates, so that the whole satellite is not scanned on each load #}
+{% set loaded_keys %}
+SELECT c.{{ target_table.key.name }}
+FROM {{ target_table.full_name }} c
+WHERE
+  {{ load_window(target_table, 'c.' ~ target_table.load_dts.name) | indent(2) }}
+{% endset %}
+{# The ranges of the keys with new versions are recomputed #}
+DELETE FROM {{ eff.full_name }}
+WHERE {{ eff.key.name }} IN (
+  {{ loaded_keys | trim | indent(2) }}
+    AND NOT EXISTS (
+      SELECT 1
+      FROM {{ eff.full_name }} e
+      WHERE e.{{ eff.key.name }} = c.{{ target_table.key.name }}
+        AND e.{{ eff.load_dts.name }} = c.{{ target_table.load_dts.name }}
+    )
+);
+INSERT INTO {{ eff.full_name }}
+SELECT
+  {{ target_table.key.name }}
+  ,{{ target_table.load_dts.name }}
+  ,{{ target_table.effective_ts.name }}
+  ,coalesce(lead({{ target_table.effective_ts.name }}) over(PARTITION BY {{ target_table.key.name }} ORDER BY {{ target_table.effective_ts.name }}), {{ end_of_time() }}) AS {{ eff.effective_ts_end.name }}
+FROM {{ target_table.full_name }} s
+WHERE
+  s.{{ target_table.key.name }} IN (
+    {{ loaded_keys | trim | indent(4) }}
+  )
+  AND NOT EXISTS (
+    SELECT 1
+    FROM {{ eff.full_name }} e
+    WHERE e.{{ eff.key.name }} = s.{{ target_table.key.name }}
+  );
@@ -0,0 +1,4 @@
+{# The effective_ts_end of the current version in an effectivity range #}
+{% macro end_of_time() -%}
+datetime('9999-12-31T23:59:59')
+{%- endmacro %}
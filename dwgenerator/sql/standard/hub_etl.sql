@@ -1,4 +1,7 @@
-{% extends 'create_persisted.sql' %}
+{% extends 'create_merged.sql' if target_table.load_strategy == 'merge' else 'create_persisted.sql' %}
 {% block select %}
 {% include 'hub_select.sql' %}
 {% endblock %}
+{% block merge_condition %}
+  t.{{ target_table.key.name }} = s.{{ target_table.key.name }}
+{% endblock %}
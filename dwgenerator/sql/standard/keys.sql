@@ -0,0 +1,12 @@
+{% from 'hash.sql' import hash, to_string %}
+{% macro business_key(expression) -%}
+upper(trim({{ to_string(expression) }}))
+{%- endmacro %}
+
+{% macro hash_key(expressions, algorithm) -%}
+{% set business_keys = [] %}
+{% for expression in expressions %}
+{% do business_keys.append(business_key(expression)) %}
+{% endfor %}
+{{ hash(business_keys, algorithm) }}
+{%- endmacro %}
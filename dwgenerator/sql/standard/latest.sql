@@ -0,0 +1,11 @@
+{% macro latest_versions(table, key, load_dts) -%}
+SELECT v.*
+FROM {{ table.full_name }} v
+JOIN (
+  SELECT {{ key.name }}, max({{ load_dts.name }}) AS {{ load_dts.name }}
+  FROM {{ table.full_name }}
+  GROUP BY {{ key.name }}
+) m
+ON m.{{ key.name }} = v.{{ key.name }}
+  AND m.{{ load_dts.name }} = v.{{ load_dts.name }}
+{%- endmacro %}
@@ -1,4 +1,7 @@
-{% extends 'create_persisted.sql' %}
+{% extends 'create_merged.sql' if target_table.load_strategy == 'merge' else 'create_persisted.sql' %}
 {% block select %}
 {% include 'link_select.sql' %}
 {% endblock %}
+{% block merge_condition %}
+  t.{{ target_table.root_key.name }} = s.{{ target_table.root_key.name }}
+{% endblock %}
@@ -1,4 +1,7 @@
-{% from 'external_param.sql' import external_param %}
+{% from 'sources.sql' import source_ctes, link_sources %}
+{% if target_table.source_style == 'cte' %}
+{{ source_ctes(target_table, mappings, insert_) -}}
+{% endif %}
 SELECT
   {{ target_table.root_key.name }}
   {% for key in target_table.keys %}
@@ -16,30 +19,9 @@ FROM (
     ,{{ target_table.rec_src.name }}
     ,row_number() over(PARTITION BY {{ target_table.root_key.name }} ORDER BY {{ target_table.load_dts.name }} asc) rn
   FROM (
-    {% set union_all = joiner("UNION ALL") %}
-    {% for source_table in mappings.source_tables(target_table) %}
-    {% set source_filter = mappings.filter(source_table, target_table) %}
-    {% set concat = joiner(" || '|' || ") %}
-    {{ union_all() }}
-    SELECT
-      {%+ for key in target_table.keys %}{{ concat() }}{{ mappings.source_column(source_table, key) }}{% endfor %} AS {{ target_table.root_key.name }}
-      {% for key in target_table.keys %}
-      ,{{ mappings.source_column(source_table, key) }} AS {{ key.name }}
-      {% endfor %}
-      ,{{ mappings.source_column(source_table, target_table.load_dts) }} AS {{ target_table.load_dts.name }}
-      ,{{ mappings.source_column(source_table, target_table.rec_src) }} AS {{ target_table.rec_src.name }}
-    FROM {{ source_table.full_name }}
-    {% if source_filter or insert_ %}
-    {% set and_ = joiner("AND ") %}
-    WHERE {% if source_filter %}{{ and_() }}{{ source_filter }}{% endif %}
-      {% if insert_ %}
-      {{ and_() }}{{ external_param('start_ts') }} <= {{ mappings.source_column(source_table, target_table.load_dts) }}
-      AND {{ mappings.source_column(source_table, target_table.load_dts) }} < {{ external_param('end_ts') }}
-      {% endif %}
-    {% endif %}
-    {% endfor %}
+    {{ link_sources(target_table, mappings, insert_) | indent(4) }}
   )
-  {% if insert_ %}
+  {% if insert_ and not merge_ %}
   q
   WHERE
     NOT EXISTS (
@@ -0,0 +1,17 @@
+{% from 'external_param.sql' import external_param %}
+{% macro watermark_table(schema) -%}
+{{ schema }}.load_watermark
+{%- endmacro %}
+
+{# The rows of a source table to load, an expression is the load_dts of the source #}
+{% macro load_window(target_table, expression) -%}
+{% if target_table.properties.generate_type == 'incremental' %}
+{% set watermark_table_name = watermark_table(target_table.schema) %}
+{# Without a watermark, or with an empty one, all rows are loaded #}
+({{ expression }} > (SELECT w.load_dts FROM {{ watermark_table_name }} w WHERE w.table_name = '{{ target_table.full_name }}')
+  OR (SELECT w.load_dts FROM {{ watermark_table_name }} w WHERE w.table_name = '{{ target_table.full_name }}') IS NULL)
+{%- else %}
+{{ external_param('start_ts') }} <= {{ expression }}
+AND {{ expression }} < {{ external_param('end_ts') }}
+{%- endif %}
+{%- endmacro %}
@@ -1,4 +1,24 @@
-{% extends 'create_persisted.sql' %}
+{% extends 'create_merged.sql' if target_table.load_strategy == 'merge' else 'create_persisted.sql' %}
 {% block select %}
 {% include 'satellite_select.sql' %}
 {% endblock %}
+{% block merge_condition %}
+  t.{{ target_table.key.name }} = s.{{ target_table.key.name }}
+  {% if target_table.compare_to == 'latest' %}
+  {# The select only returns versions that differ from the latest versions #}
+  AND t.{{ target_table.load_dts.name }} = s.{{ target_table.load_dts.name }}
+  {% elif target_table.hash_diff %}
+  AND t.{{ target_table.hash_diff.name }} = s.{{ target_table.hash_diff.name }}
+  {% else %}
+  {% for attribute in target_table.attributes %}
+  AND t.{{ attribute.name }} = s.{{ attribute.name }}
+  {% endfor %}
+  {% endif %}
+{% endblock %}
+{% block post_load %}
+{% if target_table.effectivity_table %}
+
+
+{% include 'effectivity_etl.sql' %}
+{% endif %}
+{% endblock %}
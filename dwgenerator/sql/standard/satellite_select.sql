@@ -1,53 +1,108 @@
-{% from 'external_param.sql' import external_param %}
+{% from 'load_window.sql' import load_window %}
+{% from 'sources.sql' import source_ctes, source_name %}
+{% from 'hash.sql' import hash, to_string %}
+{% from 'keys.sql' import hash_key %}
+{% from 'latest.sql' import latest_versions %}
+{% set hash_diff = target_table.hash_diff %}
+{% set source_ctes_ = target_table.source_style == 'cte' %}
+{% if source_ctes_ %}
+{{ source_ctes(target_table, mappings, insert_) -}}
+{% endif %}
+{# The columns are in the order of the table def, as the select is inserted into the table by position #}
+{% set aggregated_names = [target_table.load_dts.name] %}
+{% if hash_diff %}
+{% do aggregated_names.extend(target_table.attributes | map(attribute='name')) %}
+{% endif %}
 SELECT
-  {{ target_table.key.name }}
-  ,max({{ target_table.load_dts.name }}) AS {{ target_table.load_dts.name }}
-  {% for attribute in target_table.attributes %}
-  ,{{ attribute.name }}
+  {% for column in target_table.columns %}
+  {% if column.name in aggregated_names %}
+  {{ "," if not loop.first }}max({{ column.name }}) AS {{ column.name }}
+  {% else %}
+  {{ "," if not loop.first }}{{ column.name }}
+  {% endif %}
   {% endfor %}
-  ,{{ target_table.rec_src.name }}
 FROM (
   {% set union_all = joiner("UNION ALL") %}
   {% for source_table in mappings.source_tables(target_table) %}
-  {% set source_filter = mappings.filter(source_table, target_table) %}
+  {# The source filter, and the load window on a plain column, are applied in the source CTEs #}
+  {% set source_filter = mappings.filter(source_table, target_table) if not source_ctes_ else None %}
+  {% set window_ = insert_ and not (source_ctes_ and mappings.is_plain_column(source_table, target_table.load_dts)) %}
   {{ union_all() }}
   SELECT
+    {% if target_table.hash_keys %}
+    {# The key is mapped from the business keys of the hub or link #}
+    {{ hash_key(mappings.key_source_columns(source_table, target_table.key), target_table.key_strategy) }} AS {{ target_table.key.name }}
+    {% else %}
     {{ mappings.source_column(source_table, target_table.key) }} AS {{ target_table.key.name }}
+    {% endif %}
     ,{{ mappings.source_column(source_table, target_table.load_dts) }} AS {{ target_table.load_dts.name }}
+    {% if hash_diff %}
+    {% set attribute_columns = [] %}
+    {% for attribute in target_table.attributes %}
+    {% do attribute_columns.append(to_string(mappings.source_column(source_table, attribute))) %}
+    {% endfor %}
+    ,{{ hash(attribute_columns) }} AS {{ hash_diff.name }}
+    {% endif %}
     {% for attribute in target_table.attributes %}
     ,{{ mappings.source_column(source_table, attribute) }} AS {{ attribute.name }}
     {% endfor %}
     ,{{ mappings.source_column(source_table, target_table.rec_src) }} AS {{ target_table.rec_src.name }}
   FROM
-    {{ source_table.full_name }}
-  {% if source_filter or insert_ %}
+    {{ source_name(target_table, source_table) }}
+  {% if source_filter or window_ %}
   WHERE
     {% set and_ = joiner("AND ") %}
     {% if source_filter %}
     {{ and_() }}{{ source_filter }}
     {% endif %}
-    {% if insert_ %}
-    {{ and_() }}{{ external_param('start_ts') }} <= {{ mappings.source_column(source_table, target_table.load_dts) }}
-    AND {{ mappings.source_column(source_table, target_table.load_dts) }} < {{ external_param('end_ts') }}
+    {% if window_ %}
+    {{ and_() }}{{ load_window(target_table, mappings.source_column(source_table, target_table.load_dts)) | indent(4) }}
     {% endif %}
   {% endif %}
   {% endfor %}
 )
-{% if insert_ %}
+{# With MERGE the comparison with all versions is done in the merge condition #}
+{% if insert_ and not (merge_ and target_table.compare_to == 'history') %}
 q
 WHERE
   NOT EXISTS (
     SELECT 1
+    {% if target_table.compare_to == 'latest' %}
+    FROM (
+      {{ latest_versions(target_table, target_table.key, target_table.load_dts) | indent(6) }}
+    ) t
+    {% else %}
     FROM {{ target_table.full_name }} t
+    {% endif %}
     WHERE t.{{ target_table.key.name }} = q.{{ target_table.key.name }}
+      {% if target_table.compare_to == 'latest' %}
+      {# Versions that are not newer than the latest version are already loaded, e.g. when a load window is loaded again #}
+      AND (t.{{ target_table.load_dts.name }} >= q.{{ target_table.load_dts.name }} OR (
+        {% set and_ = joiner("AND ") %}
+        {% if hash_diff %}
+        t.{{ hash_diff.name }} = q.{{ hash_diff.name }}
+        {% else %}
+        {% for attribute in target_table.attributes %}
+        {{ and_() }}t.{{ attribute.name }} = q.{{ attribute.name }}
+        {% endfor %}
+        {% endif %}
+      ))
+      {% elif hash_diff %}
+      AND t.{{ hash_diff.name }} = q.{{ hash_diff.name }}
+      {% else %}
       {% for attribute in target_table.attributes %}
       AND t.{{ attribute.name }} = q.{{ attribute.name }}
       {% endfor %}
+      {% endif %}
   )
 {% endif %}
 GROUP BY
   {{ target_table.key.name }}
+  {% if hash_diff %}
+  ,{{ hash_diff.name }}
+  {% else %}
   {% for attribute in target_table.attributes %}
   ,{{ attribute.name }}
   {% endfor %}
+  {% endif %}
   ,{{ target_table.rec_src.name }}
@@ -0,0 +1,139 @@
+{% from 'load_window.sql' import load_window %}
+{% from 'keys.sql' import hash_key %}
+{# With #source_style cte each source table is read in a CTE, that applies the source filter, and the load
+   window when load_dts is mapped from a plain column, on the source columns before they are transformed #}
+{% macro source_cte_name(source_table) -%}
+{{ source_table.schema }}_{{ source_table.name }}_src
+{%- endmacro %}
+
+{% macro source_name(target_table, source_table) -%}
+{{ source_cte_name(source_table) if target_table.source_style == 'cte' else source_table.full_name }}
+{%- endmacro %}
+
+{% macro source_ctes(target_table, mappings, insert_) -%}
+WITH
+{% for source_table in mappings.source_tables(target_table) %}
+{% set source_filter = mappings.filter(source_table, target_table) %}
+{% set window_ = insert_ and mappings.is_plain_column(source_table, target_table.load_dts) %}
+{{ "," if not loop.first }}{{ source_cte_name(source_table) }} AS (
+  SELECT *
+  FROM {{ source_table.full_name }}
+  {% if source_filter or window_ %}
+  WHERE
+    {% set and_ = joiner("AND ") %}
+    {% if source_filter %}
+    {{ and_() }}{{ source_filter }}
+    {% endif %}
+    {% if window_ %}
+    {{ and_() }}{{ load_window(target_table, mappings.source_column(source_table, target_table.load_dts)) | indent(4) }}
+    {% endif %}
+  {% endif %}
+)
+{% endfor %}
+{%- endmacro %}
+
+{# The rows of the source tables of a hub, deduplicated within each source table before the union, so that only
+   the first load_dts of each key and source table is left to order on in the hub select #}
+{% macro hub_sources(target_table, mappings, insert_) -%}
+{% set source_ctes_ = target_table.source_style == 'cte' %}
+{% for source_table in mappings.source_tables(target_table) %}
+{# The source filter, and the load window on a plain column, are applied in the source CTEs #}
+{% set source_filter = mappings.filter(source_table, target_table) if not source_ctes_ else None %}
+{% set window_ = insert_ and not (source_ctes_ and mappings.is_plain_column(source_table, target_table.load_dts)) %}
+{{ "\nUNION ALL\n" if not loop.first }}SELECT
+  {{ target_table.key.name }}
+  {% for target_business_key in target_table.business_keys %}
+  ,{{ target_business_key.name }}
+  {% endfor %}
+  ,min({{ target_table.load_dts.name }}) AS {{ target_table.load_dts.name }}
+  ,{{ target_table.rec_src.name }}
+FROM (
+  SELECT
+    {% if target_table.hash_keys %}
+    {% set business_key_columns = [] %}
+    {% for target_business_key in target_table.business_keys %}
+    {% do business_key_columns.append(mappings.source_column(source_table, target_business_key)) %}
+    {% endfor %}
+    {{ hash_key(business_key_columns, target_table.key_strategy) }} AS {{ target_table.key.name }}
+    {% else %}
+    {{ mappings.source_column(source_table, target_table.key) }} AS {{ target_table.key.name }}
+    {% endif %}
+    {% for target_business_key in target_table.business_keys %}
+    ,{{ mappings.source_column(source_table, target_business_key) }} AS {{ target_business_key.name }}
+    {% endfor %}
+    ,{{ mappings.source_column(source_table, target_table.load_dts) }} AS {{ target_table.load_dts.name }}
+    ,{{ mappings.source_column(source_table, target_table.rec_src) }} AS {{ target_table.rec_src.name }}
+  FROM
+    {{ source_name(target_table, source_table) }}
+  {% if source_filter or window_ %}
+  WHERE
+    {% set and_ = joiner("AND ") %}
+    {% if source_filter %}
+    {{ and_() }}{{ source_filter }}
+    {% endif %}
+    {% if window_ %}
+    {{ and_() }}{{ load_window(target_table, mappings.source_column(source_table, target_table.load_dts)) | indent(4) }}
+    {% endif %}
+  {% endif %}
+)
+GROUP BY
+  {{ target_table.key.name }}
+  {% for target_business_key in target_table.business_keys %}
+  ,{{ target_business_key.name }}
+  {% endfor %}
+  ,{{ target_table.rec_src.name }}
+{%- endfor %}
+{%- endmacro %}
+
+{# The rows of the source tables of a link, deduplicated within each source table like in hub_sources #}
+{% macro link_sources(target_table, mappings, insert_) -%}
+{% set source_ctes_ = target_table.source_style == 'cte' %}
+{% for source_table in mappings.source_tables(target_table) %}
+{# The source filter, and the load window on a plain column, are applied in the source CTEs #}
+{% set source_filter = mappings.filter(source_table, target_table) if not source_ctes_ else None %}
+{% set window_ = insert_ and not (source_ctes_ and mappings.is_plain_column(source_table, target_table.load_dts)) %}
+{% set concat = joiner(" || '|' || ") %}
+{{ "\nUNION ALL\n" if not loop.first }}SELECT
+  {{ target_table.root_key.name }}
+  {% for key in target_table.keys %}
+  ,{{ key.name }}
+  {% endfor %}
+  ,min({{ target_table.load_dts.name }}) AS {{ target_table.load_dts.name }}
+  ,{{ target_table.rec_src.name }}
+FROM (
+  SELECT
+    {% if target_table.hash_keys %}
+    {# The keys are mapped from the business keys of the hubs #}
+    {% set business_key_columns = [] %}
+    {% for key in target_table.keys %}
+    {% do business_key_columns.extend(mappings.key_source_columns(source_table, key)) %}
+    {% endfor %}
+    {{ hash_key(business_key_columns, target_table.key_strategy) }} AS {{ target_table.root_key.name }}
+    {% for key in target_table.keys %}
+    ,{{ hash_key(mappings.key_source_columns(source_table, key), target_table.key_strategy) }} AS {{ key.name }}
+    {% endfor %}
+    {% else %}
+    {%+ for key in target_table.keys %}{{ concat() }}{{ mappings.source_column(source_table, key) }}{% endfor %} AS {{ target_table.root_key.name }}
+    {% for key in target_table.keys %}
+    ,{{ mappings.source_column(source_table, key) }} AS {{ key.name }}
+    {% endfor %}
+    {% endif %}
+    ,{{ mappings.source_column(source_table, target_table.load_dts) }} AS {{ target_table.load_dts.name }}
+    ,{{ mappings.source_column(source_table, target_table.rec_src) }} AS {{ target_table.rec_src.name }}
+  FROM {{ source_name(target_table, source_table) }}
+  {% if source_filter or window_ %}
+  {% set and_ = joiner("AND ") %}
+  WHERE {% if source_filter %}{{ and_() }}{{ source_filter }}{% endif %}
+    {% if window_ %}
+    {{ and_() }}{{ load_window(target_table, mappings.source_column(source_table, target_table.load_dts)) | indent(4) }}
+    {% endif %}
+  {% endif %}
+)
+GROUP BY
+  {{ target_table.root_key.name }}
+  {% for key in target_table.keys %}
+  ,{{ key.name }}
+  {% endfor %}
+  ,{{ target_table.rec_src.name }}
+{%- endfor %}
+{%- endmacro %}
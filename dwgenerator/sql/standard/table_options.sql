@@ -0,0 +1,2 @@
+{% macro table_options(target_table) -%}
+{%- endmacro %}
@@ -0,0 +1,30 @@
+{% from 'end_of_time.sql' import end_of_time %}
+{# The joins of the links on the path from the metrics satellite mtr of a version pointer to its context satellite.
+   A link with a link satellite is joined on the version that is effective at the effective_ts of the metrics satellite #}
+{% macro link_path_joins(link_columns, mtr_key_col, mtr_sat) -%}
+{% set previous_column = mtr_key_col %}
+{% set previous_alias = 'mtr' %}
+{% for column1, column2 in link_columns %}
+{% set link_alias = 'l' ~ loop.index %}
+{% if column1.parent.related_link_satellites %}
+{% set link_satellite = column1.parent.related_link_satellites[0] %}
+  JOIN (
+    SELECT
+      l.{{ column1.name }}
+      , l.{{ column2.name }}
+      , es.{{ link_satellite.effective_ts.name }}
+      , coalesce(lead(es.{{ link_satellite.effective_ts.name }}) OVER(PARTITION BY l.{{ column1.name }} ORDER BY es.{{ link_satellite.effective_ts.name }}), {{ end_of_time() }}) AS effective_ts_end
+    FROM {{ column1.parent.name }} AS l
+    JOIN {{ link_satellite.name }} AS es
+    ON es.{{ link_satellite.key.name }} = l.{{ column1.parent.root_key.name }}
+  ) AS {{ link_alias }}
+  ON {{ previous_alias }}.{{ previous_column.name }} = {{ link_alias }}.{{ column1.name }}
+    AND {{ link_alias }}.effective_ts <= mtr.{{ mtr_sat.effective_ts.name }}
+    AND mtr.{{ mtr_sat.effective_ts.name }} < {{ link_alias }}.effective_ts_end
+{% else %}
+  JOIN {{ column1.parent.name }} AS {{ link_alias }} ON {{ previous_alias }}.{{ previous_column.name }} = {{ link_alias }}.{{ column1.name }}
+{% endif %}
+{% set previous_column = column2 %}
+{% set previous_alias = 'l' %}
+{% endfor %}
+{%- endmacro %}
@@ -0,0 +1,9 @@
+{% from 'load_window.sql' import watermark_table %}
+{% include 'header.sql' %}
+
+CREATE TABLE IF NOT EXISTS {{ watermark_table(schema) }} (
+  table_name           varchar(256),
+  load_dts             timestamp,
+  updated_ts           timestamp,
+  CONSTRAINT pk_load_watermark PRIMARY KEY (table_name)
+);
@@ -0,0 +1,10 @@
+{% from 'load_window.sql' import watermark_table %}
+{% set watermark_table_name = watermark_table(target_table.schema) %}
+{# The watermark is only moved when the table has rows #}
+DELETE FROM {{ watermark_table_name }}
+WHERE table_name = '{{ target_table.full_name }}'
+  AND EXISTS (SELECT 1 FROM {{ target_table.full_name }});
+INSERT INTO {{ watermark_table_name }} (table_name, load_dts, updated_ts)
+SELECT '{{ target_table.full_name }}', m.load_dts, current_timestamp
+FROM (SELECT max({{ target_table.load_dts.name }}) AS load_dts FROM {{ target_table.full_name }}) m
+WHERE m.load_dts IS NOT NULL;
@@ -1,47 +1,126 @@
+import hashlib
 from pathlib import Path
-from re import template
 
-from jinja2 import Environment
-from jinja2.loaders import ChoiceLoader, PackageLoader
+from jinja2 import Environment, FileSystemBytecodeCache
+from jinja2.loaders import ChoiceLoader, ModuleLoader, PackageLoader
 
 from .dbobjects import MetaDataError
 
 class Templates:
-  def __init__(self, dbtype):
+  """The SQL templates for a dbtype.
+
+  bytecode_cache_dir: if given, compiled templates are cached on disk in a sub
+    directory for the dbtype. Jinja checks the cached code against the checksum
+    of the template source, so changed templates are recompiled.
+  compiled_dir: a directory that compile() has written to. If it contains
+    precompiled templates for the dbtype, that were compiled from the current
+    template sources, they are used instead of compiling the template sources.
+    compiled tells if they are used.
+  """
+  def __init__(self, dbtype, bytecode_cache_dir=None, compiled_dir=None):
+    self.dbtype = dbtype
+    self._fingerprint = None
     loaders = [
       PackageLoader('dwgenerator', f'sql/{dbtype}')
     ]
     # Use standard SQL as fallback if not the specific template is implemented.
     if dbtype != 'standard':
       loaders.append(PackageLoader('dwgenerator', 'sql/standard'))
+    self.source_loader = ChoiceLoader(loaders)
+    bytecode_cache = None
+    if bytecode_cache_dir:
+      cache_dir = Path(bytecode_cache_dir) / dbtype
+      try:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        bytecode_cache = FileSystemBytecodeCache(str(cache_dir))
+      except OSError:
+        # Not being able to cache only makes the generation slower
+        pass
     self.env = Environment(
-      loader=ChoiceLoader(loaders),
+      loader=self.source_loader,
+      bytecode_cache=bytecode_cache,
       trim_blocks=True,
       lstrip_blocks=True,
+      extensions=['jinja2.ext.do'],
     )
+    self.compiled = False
+    if compiled_dir:
+      (compiled_path, fingerprint_path) = self._compiled_paths(compiled_dir)
+      # Templates compiled from other template sources, e.g. before a template was edited, are not used
+      if compiled_path.exists() and fingerprint_path.exists() and fingerprint_path.read_text() == self.fingerprint():
+        self.env.loader = ChoiceLoader([ModuleLoader(str(compiled_path)), self.source_loader])
+        self.compiled = True
+
+  def _compiled_paths(self, compiled_dir):
+    return (Path(compiled_dir) / f'{self.dbtype}.zip', Path(compiled_dir) / f'{self.dbtype}.fingerprint')
+
+  def compile(self, compiled_dir):
+    """Compile all templates for the dbtype to <dbtype>.zip in compiled_dir.
+
+    The fingerprint of the template sources is saved in <dbtype>.fingerprint, so
+    that the compiled templates are only used while the sources are unchanged.
+    """
+    Path(compiled_dir).mkdir(parents=True, exist_ok=True)
+    (compiled_path, fingerprint_path) = self._compiled_paths(compiled_dir)
+    env = self.env.overlay(loader=self.source_loader)
+    env.compile_templates(str(compiled_path), ignore_errors=False)
+    fingerprint_path.write_text(self.fingerprint())
+
+  def fingerprint(self):
+    """A hash of the sources of all templates available for the dbtype."""
+    if self._fingerprint is None:
+      sha = hashlib.sha256()
+      for template_path in self.source_loader.list_templates():
+        source, _, _ = self.source_loader.get_source(self.env, template_path)
+        sha.update(template_path.encode('utf-8'))
+        sha.update(source.encode('utf-8'))
+      self._fingerprint = sha.hexdigest()
+    return self._fingerprint
 
   def render_template(self, template_path, **objects):
     template = self.env.get_template(template_path)
     return template.render(**objects)
 
-  def render(self, target_table, mappings):
+  def generate_template(self, template_path, **objects):
+    """Render a template as a generator of chunks of SQL, so that the whole SQL is never held in memory."""
+    template = self.env.get_template(template_path)
+    return template.generate(**objects)
+
+  def outputs(self, target_table):
+    """The template paths and output paths of the files generated for a target table."""
     table_type = target_table.table_type
     generate_type = target_table.properties['generate_type']
     if generate_type == 'view':
       template_paths = [f"{table_type}_view.sql"]
       suffixes = ['v']
-    elif generate_type == 'table':
+    elif generate_type in ['table', 'incremental']:
+      # incremental tables are loaded from a watermark instead of a load window given as parameters
       template_paths = ["create_table.sql", f"{table_type}_etl.sql"]
       suffixes = ['t', 'etl']
+      if table_type == 'satellite' and target_table.effectivity_table:
+        # The effectivity table is loaded by the load script of the satellite, that stays the last output
+        template_paths.insert(1, "create_effectivity_table.sql")
+        suffixes.insert(1, 'eff_t')
     else:
       raise MetaDataError(f"Unknown generate_type={generate_type} for {target_table.name}.")
-
-    sqls = [
-      self.render_template(template_path, target_table=target_table, mappings=mappings)
-      for template_path in template_paths
-    ]
     out_paths = [
       Path(target_table.schema) / (target_table.name + f'_{suffix}.sql')
       for suffix in suffixes
     ]
+    return list(zip(template_paths, out_paths))
+
+  def watermark_output(self, schema):
+    """The template path and output path of the watermark table for the incremental tables in a schema."""
+    return ('watermark_table.sql', Path(schema) / 'load_watermark_t.sql')
+
+  def render(self, target_table, mappings, timings=None):
+    outputs = self.outputs(target_table)
+    sqls = []
+    for (template_path, _) in outputs:
+      if timings:
+        with timings.phase(f'render {template_path}', target_table.full_name):
+          sqls.append(self.render_template(template_path, target_table=target_table, mappings=mappings))
+      else:
+        sqls.append(self.render_template(template_path, target_table=target_table, mappings=mappings))
+    out_paths = [out_path for (_, out_path) in outputs]
     return zip(out_paths, sqls)
@@ -0,0 +1,51 @@
+from collections import defaultdict
+from contextlib import contextmanager
+from time import perf_counter
+
+class Timings:
+  """Wall time and number of calls of each phase of the generation, and the time spent on each table."""
+  def __init__(self):
+    self.phases = defaultdict(lambda: [0.0, 0])
+    self.tables = defaultdict(float)
+
+  @contextmanager
+  def phase(self, name, table_name=None):
+    start = perf_counter()
+    try:
+      yield
+    finally:
+      elapsed = perf_counter() - start
+      phase = self.phases[name]
+      phase[0] += elapsed
+      phase[1] += 1
+      if table_name:
+        self.tables[table_name] += elapsed
+
+  def merge(self, other):
+    for (name, (elapsed, calls)) in other.phases.items():
+      phase = self.phases[name]
+      phase[0] += elapsed
+      phase[1] += calls
+    for (table_name, elapsed) in other.tables.items():
+      self.tables[table_name] += elapsed
+
+  def __getstate__(self):
+    # The defaultdicts have lambdas as factories, which cannot be pickled
+    return {'phases': dict(self.phases), 'tables': dict(self.tables)}
+
+  def __setstate__(self, state):
+    self.__init__()
+    self.phases.update(state['phases'])
+    self.tables.update(state['tables'])
+
+  def summary(self, top=10):
+    """Lines with the phases and the top slowest tables, the slowest first."""
+    lines = ['{:<32} {:>10} {:>8} {:>10}'.format('phase', 'total (s)', 'calls', 'mean (ms)')]
+    for (name, (elapsed, calls)) in sorted(self.phases.items(), key=lambda p: -p[1][0]):
+      lines.append('{:<32} {:>10.3f} {:>8} {:>10.3f}'.format(name, elapsed, calls, 1000 * elapsed / calls))
+    if self.tables:
+      lines.append('')
+      lines.append('{:<50} {:>10}'.format('slowest tables', 'total (s)'))
+      for (table_name, elapsed) in sorted(self.tables.items(), key=lambda t: -t[1])[:top]:
+        lines.append('{:<50} {:>10.3f}'.format(table_name, elapsed))
+    return lines
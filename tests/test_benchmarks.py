@@ -0,0 +1,17 @@
+import unittest
+
+from benchmarks.generation import benchmark
+
+class TestBenchmarks(unittest.TestCase):
+  def test_benchmark(self):
+    result = benchmark(
+      hubs=2, links=1, satellites=2, columns=3, sources=2, mapping_rows=100,
+      generate_type='table', dbtype='standard', repeat=1
+    )
+    self.assertEqual(result['counts']['tables'], 5)
+    self.assertEqual(result['counts']['table_mapping_rows'], 10)
+    self.assertEqual(result['counts']['column_mapping_rows'], 100)
+    self.assertEqual(
+      set(result['timings']),
+      set(['read_table_defs', 'read_table_mappings', 'read_column_mappings', 'build_mappings', 'check', 'check_mappings', 'render', 'total'])
+    )
@@ -1,6 +1,8 @@
+import tempfile
 import unittest
+from pathlib import Path
 
-from dwgenerator.dbobjects import Schema, Table, Column, create_typed_table, Hub, Link, Satellite, MetaDataError, MetaDataWarning
+from dwgenerator.dbobjects import DB, Schema, Table, Column, create_typed_table, Hub, Link, Satellite, MetaDataError, MetaDataWarning
 
 class TestDBObjects(unittest.TestCase):
   def test_table_from_columns(self):
@@ -20,6 +22,16 @@ class TestDBObjects(unittest.TestCase):
     ]
     self.assertEqual(table.columns, expected)
 
+  def test_table_column_lookup(self):
+    table = Table('db', 'test_table', [
+      Column('key', 'numeric'),
+      Column('field1', 'text'),
+    ])
+    self.assertIs(table['field1'], table.columns[1])
+    self.assertIsNone(table['field2'])
+    table.columns = table.columns + [Column('field2', 'text', table)]
+    self.assertIs(table['field2'], table.columns[2])
+
   def create_example_hub(self, table_number="", **properties):
     hub = create_typed_table(
       Table('dv', f'example{table_number}_h', [
@@ -41,6 +53,20 @@ class TestDBObjects(unittest.TestCase):
     self.assertEqual([c.name for c in hub.uk], ['example_id1', 'example_id2'])
     self.assertEqual(hub.fks, [])
 
+  def test_cached_column_roles(self):
+    satellite = self.create_example_satellite()
+    self.assertIs(satellite.attributes, satellite.attributes)
+    satellite.columns = satellite.columns + [Column('attribute3', 'text', satellite)]
+    self.assertEqual([a.name for a in satellite.attributes], ['attribute1', 'attribute2', 'attribute3'])
+
+  def test_set_default_properties(self):
+    satellite = self.create_example_satellite(key_strategy='sha1')
+    self.assertEqual(satellite.attributes[0].name, 'attribute1')
+    satellite.set_default_properties(key_strategy='md5', hash_diff='attribute1')
+    self.assertEqual(satellite.key_strategy, 'sha1')
+    self.assertEqual(satellite.hash_diff.name, 'attribute1')
+    self.assertEqual([a.name for a in satellite.attributes], ['attribute2'])
+
   def create_example_link(self, **properties):
     link = create_typed_table(
       Table('dv', 'example_l', [
@@ -202,3 +228,17 @@ class TestDBObjects(unittest.TestCase):
     self.assertEqual(link_satellite.referred_tables(), [link])
     self.assertEqual(link_satellite.referring_tables(), [])
     self.assertEqual(link_satellite.related_link, [link])
+
+  def test_db_read(self):
+    with tempfile.TemporaryDirectory() as table_def_dir:
+      schema_path = Path(table_def_dir) / 'dv'
+      schema_path.mkdir()
+      for table_name in ['c_h', 'a_h', 'b_h', 'a_b_l']:
+        (schema_path / f'{table_name}.csv').write_text(
+          f"name,type\n{table_name.replace('_h', '')}_key,text\nid,text\nload_dts,numeric\nrec_src,text\n"
+        )
+      for max_workers in [None, 3]:
+        db = DB.read(Path(table_def_dir), max_workers)
+        self.assertEqual(list(db['dv'].tables), ['a_b_l', 'a_h', 'b_h', 'c_h'])
+        self.assertEqual(db['dv']['a_h'].key.name, 'a_key')
+        self.assertEqual(db['dv']['a_b_l'].table_type, 'link')
@@ -0,0 +1,71 @@
+import unittest
+
+from dwgenerator.dbobjects import Schema
+from dwgenerator.dependencies import table_dependencies, dependency_levels, dependency_order, etl_schedule, schedule_makefile
+from dwgenerator.mappings import TableMappings, ColumnMappings, Mappings
+from dwgenerator.templates import Templates
+from .utils import TableMapping, ColumnMapping, create_example_hub, create_example_link, create_example_satellite, create_example_link_satellite, create_example_version_pointer
+
+class TestDependencies(unittest.TestCase):
+  def setUp(self):
+    self.vp_1_2 = create_example_version_pointer("1", "2")
+    self.lsat_1_2 = create_example_link_satellite("1", "2")
+    self.sat2 = create_example_satellite("2")
+    self.link_1_2 = create_example_link("1", "2")
+    self.sat1 = create_example_satellite("1")
+    self.hub2 = create_example_hub("2")
+    self.hub1 = create_example_hub("1")
+    self.schema = Schema('dv', [self.vp_1_2, self.lsat_1_2, self.sat2, self.link_1_2, self.sat1, self.hub2, self.hub1])
+    table_mappings = TableMappings([t._asdict() for t in [
+      TableMapping("dv", "example1_s", "", "dv", "example_1_2_vp"),
+      TableMapping("dv", "example1_h", "", "dv", "example_1_2_vp"),
+      TableMapping("dv", "example_1_2_l", "", "dv", "example_1_2_vp"),
+      TableMapping("dv", "example2_h", "", "dv", "example_1_2_vp"),
+      TableMapping("dv", "example2_s", "", "dv", "example_1_2_vp"),
+    ]])
+    column_mappings = ColumnMappings([c._asdict() for c in [
+      ColumnMapping("dv", "example1_s", "example1_key", "", "dv", "example_1_2_vp", "example1_m_key"),
+      ColumnMapping("dv", "example2_s", "example2_key", "", "dv", "example_1_2_vp", "example2_c_key"),
+      ColumnMapping("dv", "example2_s", "load_dts", "", "dv", "example_1_2_vp", "example2_c_load_dts"),
+      ColumnMapping("dv", "example1_s", "load_dts", "", "dv", "example_1_2_vp", "load_dts"),
+    ]])
+    self.mappings = Mappings(table_mappings, column_mappings, list(self.schema.tables.values()))
+
+  def names(self, tables):
+    return [table.name for table in tables]
+
+  def test_table_dependencies(self):
+    self.assertEqual(self.names(table_dependencies(self.link_1_2)), ['example1_h', 'example2_h'])
+    self.assertEqual(self.names(table_dependencies(self.lsat_1_2)), ['example_1_2_l'])
+    self.assertEqual(table_dependencies(self.vp_1_2), [])
+    self.assertEqual(
+      set(self.names(table_dependencies(self.vp_1_2, self.mappings))),
+      set(['example1_s', 'example1_h', 'example_1_2_l', 'example2_h', 'example2_s'])
+    )
+
+  def test_dependency_levels(self):
+    levels = dependency_levels(self.schema.tables.values(), self.mappings)
+    self.assertEqual([self.names(level) for level in levels], [
+      ['example1_h', 'example2_h'],
+      ['example_1_2_l', 'example1_s', 'example2_s'],
+      ['example_1_2_l_s', 'example_1_2_vp'],
+    ])
+    # Dependencies on tables that are not ordered are ignored
+    self.assertEqual(
+      self.names(dependency_order([self.sat1, self.vp_1_2, self.hub1], self.mappings)),
+      ['example1_h', 'example1_s', 'example_1_2_vp']
+    )
+
+  def test_etl_schedule(self):
+    for table in [self.hub1, self.link_1_2, self.lsat_1_2, self.vp_1_2]:
+      table.properties['generate_type'] = 'table'
+    schedule = etl_schedule(self.schema.tables.values(), self.mappings, Templates('standard'))
+    self.assertEqual(schedule, [
+      [{'table': 'dv.example1_h', 'script': 'dv/example1_h_etl.sql', 'depends_on': []}],
+      [{'table': 'dv.example_1_2_l', 'script': 'dv/example_1_2_l_etl.sql', 'depends_on': ['dv.example1_h']}],
+      # Version pointers have no load scripts
+      [{'table': 'dv.example_1_2_l_s', 'script': 'dv/example_1_2_l_s_etl.sql', 'depends_on': ['dv.example_1_2_l']}],
+    ])
+    makefile = schedule_makefile(schedule)
+    self.assertIn('dv.example_1_2_l_s: dv.example_1_2_l\n\t$(SQL) dv/example_1_2_l_s_etl.sql\n', makefile)
+    self.assertNotIn('example_1_2_vp', makefile)
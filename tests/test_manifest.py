@@ -0,0 +1,77 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from dwgenerator.dbobjects import Schema
+from dwgenerator.mappings import TableMappings, ColumnMappings, Mappings
+from dwgenerator.manifest import Manifest, table_fingerprint, rendered_tables
+from dwgenerator.templates import Templates
+from .utils import TableMapping, ColumnMapping, create_example_hub, create_example_link, create_example_satellite, create_example_link_satellite, create_example_version_pointer
+
+class TestManifest(unittest.TestCase):
+  def setUp(self):
+    self.templates = Templates('standard')
+    self.hub = create_example_hub("1")
+    self.table_mappings = TableMappings([
+      TableMapping("src", "customers", "", "dv", "example1_h")._asdict()
+    ])
+
+  def create_mappings(self, load_dts_source):
+    column_mappings = ColumnMappings([c._asdict() for c in [
+      ColumnMapping("src", "customers", "id", "", "dv", "example1_h", "example1_key"),
+      ColumnMapping("src", "customers", load_dts_source, "", "dv", "example1_h", "load_dts"),
+      ColumnMapping("src", "customers", "id", "", "dv", "example2_h", "example2_key"),
+    ]])
+    return Mappings(self.table_mappings, column_mappings, [self.hub] + column_mappings.source_tables())
+
+  def test_table_fingerprint(self):
+    fingerprint = table_fingerprint(self.hub, self.create_mappings('ts'), self.templates)
+    self.assertEqual(fingerprint, table_fingerprint(self.hub, self.create_mappings('ts'), self.templates))
+    self.assertNotEqual(fingerprint, table_fingerprint(self.hub, self.create_mappings('ts2'), self.templates))
+    self.assertNotEqual(fingerprint, table_fingerprint(self.hub, self.create_mappings('ts'), Templates('snowflake')))
+
+  def test_version_pointer_fingerprint(self):
+    vp = create_example_version_pointer("1", "2")
+    link_satellite = create_example_link_satellite("1", "2")
+    context_satellite = create_example_satellite("2")
+    schema = Schema('dv', [
+      vp, create_example_satellite("1"), create_example_hub("1"), create_example_link("1", "2"),
+      link_satellite, create_example_hub("2"), context_satellite,
+    ])
+    table_mappings = TableMappings([
+      TableMapping("dv", table, "", "dv", "example_1_2_vp")._asdict()
+      for table in ["example1_s", "example1_h", "example_1_2_l", "example2_h", "example2_s"]
+    ])
+    column_mappings = ColumnMappings([c._asdict() for c in [
+      ColumnMapping("dv", "example1_s", "example1_key", "", "dv", "example_1_2_vp", "example1_m_key"),
+      ColumnMapping("dv", "example2_s", "example2_key", "", "dv", "example_1_2_vp", "example2_c_key"),
+      ColumnMapping("dv", "example2_s", "load_dts", "", "dv", "example_1_2_vp", "example2_c_load_dts"),
+      ColumnMapping("dv", "example1_s", "load_dts", "", "dv", "example_1_2_vp", "load_dts"),
+    ]])
+    mappings = Mappings(table_mappings, column_mappings, list(schema.tables.values()))
+    self.assertEqual(
+      sorted(table.name for table in rendered_tables(vp, mappings)),
+      ['example1_h', 'example1_s', 'example2_h', 'example2_s', 'example_1_2_l', 'example_1_2_l_s', 'example_1_2_vp']
+    )
+    # Changes of the tables on the path of the version pointer change its fingerprint
+    fingerprint = table_fingerprint(vp, mappings, self.templates)
+    context_satellite.properties['effectivity_table'] = 'true'
+    self.assertNotEqual(table_fingerprint(vp, mappings, self.templates), fingerprint)
+    fingerprint = table_fingerprint(vp, mappings, self.templates)
+    link_satellite.properties['key_strategy'] = 'md5'
+    self.assertNotEqual(table_fingerprint(vp, mappings, self.templates), fingerprint)
+
+  def test_manifest(self):
+    with tempfile.TemporaryDirectory() as out:
+      manifest = Manifest.read(out)
+      self.assertFalse(manifest.is_current('dv.example1_h', 'abc'))
+      (Path(out) / 'dv').mkdir()
+      (Path(out) / 'dv' / 'example1_h_v.sql').write_text('')
+      manifest.update('dv.example1_h', 'abc', [Path('dv') / 'example1_h_v.sql'])
+      manifest.write()
+
+      manifest = Manifest.read(out)
+      self.assertTrue(manifest.is_current('dv.example1_h', 'abc'))
+      self.assertFalse(manifest.is_current('dv.example1_h', 'def'))
+      (Path(out) / 'dv' / 'example1_h_v.sql').unlink()
+      self.assertFalse(manifest.is_current('dv.example1_h', 'abc'))
@@ -104,3 +104,101 @@ class TestMappings(unittest.TestCase):
       ]
     )
 
+
+  def test_indexed_lookups(self):
+    table_mappings = TableMappings([t._asdict() for t in [
+      TableMapping("src", "customers", "", "dv", "customer_h"),
+      TableMapping("src", "sales_lines", "id != 0", "dv", "customer_h"),
+      TableMapping("src", "customers", "", "dv", "customer_s"),
+    ]])
+    column_mappings = ColumnMappings([c._asdict() for c in [
+      ColumnMapping("src", "customers", "ssn", "", "dv", "customer_h", "customer_key"),
+      ColumnMapping("src", "sales_lines", "ssn", "", "dv", "customer_h", "customer_key"),
+      ColumnMapping("src", "customers", "load_dts", "", "dv", "customer_h", "load_dts"),
+      ColumnMapping("src", "customers", "name", "", "dv", "customer_s", "name"),
+    ]])
+    result = table_mappings.to_table("dv", "customer_h")
+    self.assertIsInstance(result, TableMappings)
+    self.assertEqual([m['source_table'] for m in result], ["customers", "sales_lines"])
+    self.assertEqual(
+      table_mappings.from_table("src", "sales_lines").to_table("dv", "customer_h"),
+      [table_mappings[1]]
+    )
+    self.assertEqual(table_mappings.to_table("dv", "missing"), [])
+    self.assertEqual(column_mappings.to_table("dv", "customer_h"), column_mappings[:3])
+    self.assertEqual(column_mappings.from_table("src", "customers"), [column_mappings[0], column_mappings[2], column_mappings[3]])
+    self.assertEqual(column_mappings.to_column("dv", "customer_h", "customer_key"), column_mappings[:2])
+    self.assertEqual(column_mappings.from_column("src", "customers", "name"), [column_mappings[3]])
+
+  def test_mappings_cache(self):
+    hub = create_example_hub("1")
+    table_mappings = TableMappings([
+      TableMapping("src", "customers", "id != 0", "dv", "example1_h")._asdict()
+    ])
+    column_mappings = ColumnMappings([c._asdict() for c in [
+      ColumnMapping("src", "customers", "id", "", "dv", "example1_h", "example1_key"),
+      ColumnMapping("src", "customers", "id1", "", "dv", "example1_h", "example_id1"),
+      ColumnMapping("src", "customers", "id2", "", "dv", "example1_h", "example_id2"),
+      ColumnMapping("src", "customers", "ts", "", "dv", "example1_h", "load_dts"),
+      ColumnMapping("src", "customers", "", "'src'", "dv", "example1_h", "rec_src"),
+    ]])
+    mappings = Mappings(table_mappings, column_mappings, [hub] + column_mappings.source_tables())
+    [source_table] = mappings.source_tables(hub)
+    self.assertEqual(mappings.cache_info(), (0, 1, 1))
+    self.assertEqual(mappings.source_column(source_table, hub.load_dts), 'ts')
+    self.assertEqual(mappings.source_column(source_table, hub.load_dts), 'ts')
+    self.assertEqual(mappings.source_column(source_table, hub.load_dts, 'q'), 'q.ts')
+    self.assertEqual(mappings.filter(source_table, hub), 'id != 0')
+    self.assertEqual(mappings.cache_info(), (1, 4, 4))
+    mappings.check(hub)
+    self.assertEqual(mappings.cache_info().currsize, 8)
+
+    mappings.column_mappings = ColumnMappings([
+      ColumnMapping("src", "customers", "ts2", "", "dv", "example1_h", "load_dts")._asdict()
+    ])
+    self.assertEqual(mappings.cache_info().currsize, 0)
+    self.assertEqual(mappings.source_column(source_table, hub.load_dts), 'ts2')
+
+  def create_hashed_link_mappings(self, hub_key_strategy='md5', example2_id1='example_id1'):
+    hub1 = create_example_hub("1", key_strategy=hub_key_strategy)
+    hub2 = create_example_hub("2", key_strategy='md5')
+    link = create_example_link("1", "2", key_strategy='md5')
+    _ = Schema('dv', [hub1, hub2, link])
+    table_mappings = TableMappings([t._asdict() for t in [
+      TableMapping("src", "orders", "", "dv", "example1_h"),
+      TableMapping("src", "orders", "", "dv", "example_1_2_l"),
+    ]])
+    column_mappings = ColumnMappings([c._asdict() for c in [
+      ColumnMapping("src", "orders", "customer_no", "", "dv", "example1_h", "example_id1"),
+      ColumnMapping("src", "orders", "country", "", "dv", "example1_h", "example_id2"),
+      ColumnMapping("src", "orders", "ts", "", "dv", "example1_h", "load_dts"),
+      ColumnMapping("src", "orders", "", "'src'", "dv", "example1_h", "rec_src"),
+      # The business keys of the hubs in another order than in the hubs
+      ColumnMapping("src", "orders", "country", "", "dv", "example_1_2_l", "example1_key"),
+      ColumnMapping("src", "orders", "customer_no", "", "dv", "example_1_2_l", "example1_key"),
+      ColumnMapping("src", "orders", "example_id2", "", "dv", "example_1_2_l", "example2_key"),
+      ColumnMapping("src", "orders", example2_id1, "", "dv", "example_1_2_l", "example2_key"),
+      ColumnMapping("src", "orders", "ts", "", "dv", "example_1_2_l", "load_dts"),
+      ColumnMapping("src", "orders", "", "'src'", "dv", "example_1_2_l", "rec_src"),
+    ]])
+    mappings = Mappings(table_mappings, column_mappings, [hub1, hub2, link] + column_mappings.source_tables())
+    return link, mappings
+
+  def test_key_source_columns(self):
+    link, mappings = self.create_hashed_link_mappings()
+    mappings.check(link)
+    [source_table] = mappings.source_tables(link)
+    # Matched to the business keys of the hub on the mappings of the hub from the same source table
+    self.assertEqual(mappings.key_source_columns(source_table, link['example1_key']), ['customer_no', 'country'])
+    # and else on the names of the business keys
+    self.assertEqual(mappings.key_source_columns(source_table, link['example2_key']), ['example_id1', 'example_id2'])
+
+  def test_key_source_columns_unmatched(self):
+    link, mappings = self.create_hashed_link_mappings(example2_id1='product_no')
+    with self.assertRaises(MetaDataError):
+      mappings.check(link)
+
+  def test_key_strategy_mismatch(self):
+    link, mappings = self.create_hashed_link_mappings(hub_key_strategy='mapping')
+    with self.assertRaises(MetaDataError):
+      mappings.check(link)
@@ -0,0 +1,81 @@
+import os
+import tempfile
+import unittest
+from pathlib import Path
+
+from dwgenerator.output import OutputWriter, BundleWriter, SpoolWriter, spool_chunks
+
+class TestOutputWriter(unittest.TestCase):
+  def test_write_if_changed(self):
+    with tempfile.TemporaryDirectory() as out:
+      writer = OutputWriter(out)
+      self.assertTrue(writer.write(Path('dv') / 'a_v.sql', 'SELECT 1\n;\n'))
+      path = Path(out) / 'dv' / 'a_v.sql'
+      mtime = path.stat().st_mtime_ns
+      os.utime(path, ns=(mtime - 10**9, mtime - 10**9))
+      self.assertFalse(writer.write(Path('dv') / 'a_v.sql', 'SELECT 1\n;\n'))
+      self.assertEqual(path.stat().st_mtime_ns, mtime - 10**9)
+      self.assertTrue(writer.write(Path('dv') / 'a_v.sql', 'SELECT 2\n;\n'))
+      with open(path) as infile:
+        self.assertEqual(infile.read(), 'SELECT 2\n;\n')
+      self.assertEqual((writer.written, writer.unchanged, writer.deleted), (2, 1, 0))
+
+  def test_prune(self):
+    with tempfile.TemporaryDirectory() as out:
+      writer = OutputWriter(out)
+      writer.write(Path('dv') / 'a_v.sql', 'SELECT 1')
+      (Path(out) / 'dv' / 'b_v.sql').write_text('SELECT 2')
+      (Path(out) / 'dv' / 'c_v.sql').write_text('SELECT 3')
+      (Path(out) / 'dv' / 'notes.txt').write_text('')
+      writer.keep(Path('dv') / 'c_v.sql')
+      self.assertEqual(writer.prune(), [Path(out) / 'dv' / 'b_v.sql'])
+      self.assertEqual(sorted(p.name for p in (Path(out) / 'dv').iterdir()), ['a_v.sql', 'c_v.sql', 'notes.txt'])
+      self.assertEqual(writer.summary(), 'written=1, unchanged=0, deleted=1')
+
+  def test_write_chunks(self):
+    with tempfile.TemporaryDirectory() as out:
+      writer = OutputWriter(out)
+      self.assertTrue(writer.write_chunks(Path('dv') / 'a_v.sql', iter(['SELECT ', '1', '\n;\n'])))
+      self.assertFalse(writer.write_chunks(Path('dv') / 'a_v.sql', iter(['SELECT 1\n', ';\n'])))
+      with self.assertRaises(ValueError):
+        writer.write_chunks(Path('dv') / 'a_v.sql', (str(int(chunk)) for chunk in ['2', 'x']))
+      with open(Path(out) / 'dv' / 'a_v.sql') as infile:
+        self.assertEqual(infile.read(), 'SELECT 1\n;\n')
+      self.assertEqual(sorted(p.name for p in (Path(out) / 'dv').iterdir()), ['a_v.sql'])
+      self.assertEqual((writer.written, writer.unchanged), (1, 1))
+
+class TestSpoolWriter(unittest.TestCase):
+  def test_spool(self):
+    spool_file = SpoolWriter().open(Path('dv') / 'a_v.sql')
+    spool_file.write('SELECT 1\n')
+    spool_file.write(';\n')
+    path = spool_file.close()
+    self.assertEqual(''.join(spool_chunks(path, chunk_size=4)), 'SELECT 1\n;\n')
+    self.assertFalse(os.path.exists(path))
+
+  def test_discard(self):
+    spool_file = SpoolWriter().open(Path('dv') / 'a_v.sql')
+    spool_file.write('SELECT')
+    spool_file.discard()
+    self.assertFalse(os.path.exists(spool_file.path))
+
+class TestBundleWriter(unittest.TestCase):
+  def test_bundle(self):
+    with tempfile.TemporaryDirectory() as out:
+      bundles = BundleWriter(OutputWriter(out))
+      bundles.write_chunks(Path('dv') / 'a_h_v.sql', ['SELECT 1', ';'])
+      with self.assertRaises(ValueError):
+        bundles.write_chunks(Path('dv') / 'b_h_v.sql', (str(int(chunk)) for chunk in ['2', 'x']))
+      bundles.write_chunks(Path('dm') / 'c_v.sql', ['SELECT 3;'])
+      self.assertEqual(bundles.close(), [(Path('deploy.sql'), True)])
+      with open(Path(out) / 'deploy.sql') as infile:
+        self.assertEqual(infile.read(), '-- dv/a_h_v.sql\nSELECT 1;\n\n-- dm/c_v.sql\nSELECT 3;\n')
+
+  def test_bundle_by_schema_and_size(self):
+    with tempfile.TemporaryDirectory() as out:
+      bundles = BundleWriter(OutputWriter(out), by_schema=True, max_size=40)
+      for (schema, name) in [('dv', 'a_h_v'), ('dv', 'b_h_v'), ('dm', 'c_v'), ('dv', 'd_s_v')]:
+        bundles.write_chunks(Path(schema) / f'{name}.sql', ['SELECT 1;'])
+      self.assertEqual([path.as_posix() for (path, _) in bundles.close()], ['dv/deploy_001.sql', 'dv/deploy_002.sql', 'dm/deploy_001.sql'])
+      with open(Path(out) / 'dv' / 'deploy_002.sql') as infile:
+        self.assertEqual(infile.read(), '-- dv/d_s_v.sql\nSELECT 1;\n')
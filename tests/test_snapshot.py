@@ -0,0 +1,65 @@
+import os
+import tempfile
+import unittest
+from pathlib import Path
+
+from dwgenerator.snapshot import load_metadata
+
+TABLE_MAPPINGS = """source_schema,source_table,source_filter,target_schema,target_table
+src,customers,,dv,customer_h
+"""
+COLUMN_MAPPINGS = """src_schema,src_table,src_column,transformation,tgt_schema,tgt_table,tgt_column
+src,customers,ssn,,dv,customer_h,customer_key
+src,customers,ssn,,dv,customer_h,ssn
+src,customers,load_dts,,dv,customer_h,load_dts
+src,customers,,'src',dv,customer_h,rec_src
+"""
+TARGET_TABLES = """schema,table,generate,table_type
+dv,customer_h,true,table
+"""
+CUSTOMER_H = """name,type
+customer_key,text
+ssn,text
+load_dts,numeric
+rec_src,text
+"""
+
+class TestSnapshot(unittest.TestCase):
+  def setUp(self):
+    self.tmp_dir = tempfile.TemporaryDirectory()
+    self.metadata_path = Path(self.tmp_dir.name) / 'metadata'
+    self.snapshot_path = Path(self.tmp_dir.name) / 'snapshot.pickle'
+    for (path, content) in [
+      ('mapping/table/table_mappings.csv', TABLE_MAPPINGS),
+      ('mapping/column/column_mappings.csv', COLUMN_MAPPINGS),
+      ('target_tables.csv', TARGET_TABLES),
+      ('table_def/dv/customer_h.csv', CUSTOMER_H),
+    ]:
+      (self.metadata_path / path).parent.mkdir(parents=True, exist_ok=True)
+      (self.metadata_path / path).write_text(content)
+
+  def tearDown(self):
+    self.tmp_dir.cleanup()
+
+  def test_load_metadata(self):
+    db, table_mappings, column_mappings, target_tables = load_metadata(self.metadata_path, self.snapshot_path)
+    self.assertTrue(self.snapshot_path.exists())
+    self.assertEqual([c.name for c in db['dv']['customer_h'].business_keys], ['ssn'])
+    self.assertEqual(len(column_mappings.to_table('dv', 'customer_h')), 4)
+
+    snapshot_mtime = self.snapshot_path.stat().st_mtime_ns
+    metadata = load_metadata(self.metadata_path, self.snapshot_path)
+    self.assertEqual(self.snapshot_path.stat().st_mtime_ns, snapshot_mtime)
+    self.assertEqual(metadata.target_tables, target_tables)
+    self.assertEqual(metadata.table_mappings, table_mappings)
+    self.assertEqual(metadata.column_mappings, column_mappings)
+    self.assertEqual(str(metadata.db['dv']['customer_h']), str(db['dv']['customer_h']))
+
+  def test_changed_file(self):
+    load_metadata(self.metadata_path, self.snapshot_path)
+    table_def_path = self.metadata_path / 'table_def/dv/customer_h.csv'
+    table_def_path.write_text(CUSTOMER_H.replace('ssn', 'pid'))
+    mtime = table_def_path.stat().st_mtime_ns
+    os.utime(table_def_path, ns=(mtime + 10**9, mtime + 10**9))
+    db, _, _, _ = load_metadata(self.metadata_path, self.snapshot_path)
+    self.assertEqual([c.name for c in db['dv']['customer_h'].business_keys], ['pid'])
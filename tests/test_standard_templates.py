@@ -1,3 +1,4 @@
+import hashlib
 import sqlite3
 import unittest
 from collections import namedtuple
@@ -20,6 +21,7 @@ class TestStandardTemplates(unittest.TestCase):
     self.start_ts = datetime.fromisoformat('2021-06-01T12:10:00+00:00').timestamp()
     self.templates = Templates(self.dbtype)
     self.connection = sqlite3.connect(':memory:')
+    self.connection.create_function('md5', 1, lambda text: hashlib.md5(text.encode('utf-8')).hexdigest())
     self.cur = self.connection.cursor()
     self.cur.execute("ATTACH DATABASE ':memory:' AS db")
 
@@ -62,6 +64,19 @@ class TestStandardTemplates(unittest.TestCase):
     target_table.check()
     return target_table
 
+  def create_customer_hash_diff_s(self, **properties):
+    target_table = create_typed_table(
+      Table('db', 'customer_s', [
+        Column('customer_key', 'text'),
+        Column('load_dts', 'numeric'),
+        Column('hash_diff', 'text'),
+        Column('ssn', 'text'),
+        Column('name', 'text'),
+        Column('rec_src', 'text'),
+    ], **properties))
+    target_table.check()
+    return target_table
+
   # Create mappings
   def create_customer_h_mappings(self, target_table):
     # I use the same source and target database as sqlite cannot create views that use other dbs
@@ -311,3 +326,246 @@ class TestStandardTemplates(unittest.TestCase):
       ('199201010101', 1622549402.0, '199201010101', 'Ashley', 'db'),
     ]
     self.assertEqual(result2, expected2)
+
+  def test_satellite_hash_diff_persisted(self):
+    target_table = self.create_customer_hash_diff_s(generate_type='table')
+    self.assertEqual(target_table.hash_diff.name, 'hash_diff')
+    self.assertEqual([c.name for c in target_table.attributes], ['ssn', 'name'])
+    mappings = self.create_customer_s_mappings(target_table)
+    [(_, ddl), (_, etl)] = self.templates.render(target_table, mappings)
+    self.cur.executescript(ddl)
+    self.create_customers()
+
+    ts = self.start_ts
+    hash_diff = lambda ssn, name: hashlib.md5(f'{ssn}|{name}'.encode('utf-8')).hexdigest()
+    self.executescript(etl, {'start_ts': ts, 'end_ts': ts + 2})
+    result1 = list(self.cur.execute('SELECT * FROM db.customer_s ORDER BY load_dts'))
+    expected1 = [
+      ('198001010101', 1622549400.0, hash_diff('198001010101', 'Michael'), '198001010101', 'Michael', 'db'),
+      ('199001010101', 1622549401.0, hash_diff('199001010101', 'Jessica'), '199001010101', 'Jessica', 'db'),
+    ]
+    self.assertEqual(result1, expected1)
+
+    self.cur.executemany('INSERT INTO db.customers VALUES(?, ?, ?)', [
+      ('198001010101', 'Mike', ts + 3),
+      ('199001010101', 'Jessica', ts + 3),
+    ])
+    self.executescript(etl, {'start_ts': ts + 2, 'end_ts': ts + 4})
+    result2 = list(self.cur.execute('SELECT * FROM db.customer_s ORDER BY load_dts'))
+    expected2 = expected1 + [
+      ('199201010101', 1622549402.0, hash_diff('199201010101', 'Ashley'), '199201010101', 'Ashley', 'db'),
+      ('198001010101', 1622549403.0, hash_diff('198001010101', 'Mike'), '198001010101', 'Mike', 'db'),
+    ]
+    self.assertEqual(result2, expected2)
+
+  def test_satellite_column_order_persisted(self):
+    # The load script inserts the columns in the order of the table def
+    target_table = create_typed_table(
+      Table('db', 'customer_s', [
+        Column('customer_key', 'text'),
+        Column('name', 'text'),
+        Column('rec_src', 'text'),
+        Column('ssn', 'text'),
+        Column('hash_diff', 'text'),
+        Column('load_dts', 'numeric'),
+    ], generate_type='table'))
+    target_table.check()
+    [(_, ddl), (_, etl)] = self.templates.render(target_table, self.create_customer_s_mappings(target_table))
+    self.cur.executescript(ddl)
+    self.create_customers()
+    ts = self.start_ts
+    self.executescript(etl, {'start_ts': ts, 'end_ts': ts + 1})
+    result = list(self.cur.execute('SELECT * FROM db.customer_s'))
+    hash_diff = hashlib.md5('Michael|198001010101'.encode('utf-8')).hexdigest()
+    self.assertEqual(result, [('198001010101', 'Michael', 'db', '198001010101', hash_diff, 1622549400.0)])
+
+  def test_satellite_hash_diff_property(self):
+    target_table = create_typed_table(
+      Table('db', 'customer_s', [
+        Column('customer_key', 'text'),
+        Column('load_dts', 'numeric'),
+        Column('content_hash', 'text'),
+        Column('ssn', 'text'),
+        Column('rec_src', 'text'),
+    ], hash_diff='Content_Hash'))
+    self.assertEqual(target_table.hash_diff.name, 'content_hash')
+    self.assertEqual(target_table.generated_columns, [target_table.hash_diff])
+    self.assertIsNone(self.create_customer_s().hash_diff)
+
+  def test_hub_hash_key_view(self):
+    target_table = self.create_customer_h(key_strategy='md5')
+    self.assertEqual(target_table.generated_columns, [target_table.key])
+    mappings = self.create_customer_h_mappings(target_table)
+    sql = self.render_view(target_table, mappings)
+
+    self.cur.execute('CREATE TABLE db.customers (ssn, name, load_dts)')
+    self.cur.execute('CREATE TABLE db.sales_lines (txn_id, ssn, load_dts)')
+    ts = self.start_ts
+    self.cur.executemany('INSERT INTO db.customers VALUES(?, ?, ?)', [
+      ('abc1 ', 'Michael', ts),
+    ])
+    self.cur.executemany('INSERT INTO db.sales_lines VALUES(?, ?, ?)', [
+      ('1234', 'ABC1', ts + 20),
+      ('2345', 'abc2', ts + 21),
+    ])
+    self.cur.executescript(sql)
+
+    result = list(self.cur.execute('SELECT * FROM db.customer_h ORDER BY load_dts'))
+    md5 = lambda text: hashlib.md5(text.encode('utf-8')).hexdigest()
+    expected = [
+      (md5('ABC1'), 'abc1 ', 1622549400.0, 'db'),
+      (md5('ABC2'), 'abc2', 1622549421.0, 'db'),
+    ]
+    self.assertEqual(result, expected)
+
+  def test_link_hash_key_view(self):
+    target_table = self.create_sales_line_customer_l(key_strategy='md5')
+    mappings = self.create_sales_line_customer_l_mappings(target_table)
+    sql = self.render_view(target_table, mappings)
+
+    self.create_sales_lines()
+    self.cur.executescript(sql)
+
+    result = list(self.cur.execute('SELECT * FROM db.sales_line_customer_l ORDER BY load_dts'))
+    md5 = lambda text: hashlib.md5(text.encode('utf-8')).hexdigest()
+    expected = [
+      (md5('1234|198001010101'), md5('1234'), md5('198001010101'), 1622549420.0, 'db'),
+      (md5('2345|199001010101'), md5('2345'), md5('199001010101'), 1622549421.0, 'db'),
+      (md5('3456|199201010101'), md5('3456'), md5('199201010101'), 1622553001.0, 'db'),
+    ]
+    self.assertEqual(result, expected)
+
+  def test_unknown_key_strategy(self):
+    with self.assertRaises(MetaDataError):
+      self.create_customer_h(key_strategy='crc32')
+
+  def test_satellite_compare_to_latest_persisted(self):
+    for (compare_to, reverted) in [('history', False), ('latest', True)]:
+      self.cur.execute('DROP TABLE IF EXISTS db.customers')
+      target_table = self.create_customer_s(generate_type='table', compare_to=compare_to)
+      mappings = self.create_customer_s_mappings(target_table)
+      [(_, ddl), (_, etl)] = self.templates.render(target_table, mappings)
+      self.cur.executescript(ddl)
+      self.cur.execute('CREATE TABLE db.customers (ssn, name, load_dts)')
+      ts = self.start_ts
+      self.cur.executemany('INSERT INTO db.customers VALUES(?, ?, ?)', [
+        ('198001010101', 'Michael', ts),
+        ('198001010101', 'Mike', ts + 1),
+        ('198001010101', 'Michael', ts + 2),
+      ])
+      for i in range(3):
+        self.executescript(etl, {'start_ts': ts + i, 'end_ts': ts + i + 1})
+      result = list(self.cur.execute('SELECT name FROM db.customer_s ORDER BY load_dts'))
+      self.assertEqual(result, [('Michael',), ('Mike',)] + ([('Michael',)] if reverted else []))
+      # Loading the windows again adds nothing
+      for i in range(3):
+        self.executescript(etl, {'start_ts': ts + i, 'end_ts': ts + i + 1})
+      self.executescript(etl, {'start_ts': ts, 'end_ts': ts + 3})
+      self.assertEqual(list(self.cur.execute('SELECT name FROM db.customer_s ORDER BY load_dts')), result)
+
+    with self.assertRaises(MetaDataError):
+      self.create_customer_s(compare_to='first')
+
+  def test_merge_load_strategy(self):
+    # sqlite has no MERGE, so only the structure of the load scripts is tested
+    for (target_table, create_mappings, condition) in [
+      (self.create_customer_h(generate_type='table', load_strategy='merge'), self.create_customer_h_mappings, 't.customer_key = s.customer_key\n)'),
+      (self.create_sales_line_customer_l(generate_type='table', load_strategy='MERGE'), self.create_sales_line_customer_l_mappings, 't.sales_line_customer_l_key = s.sales_line_customer_l_key\n)'),
+      (self.create_customer_s(generate_type='table', load_strategy='merge'), self.create_customer_s_mappings, 't.customer_key = s.customer_key\n  AND t.ssn = s.ssn\n  AND t.name = s.name\n)'),
+    ]:
+      [_, (_, etl)] = self.templates.render(target_table, create_mappings(target_table))
+      self.assertIn(f'MERGE INTO {target_table.full_name} t\n', etl)
+      self.assertIn(f'ON (\n  {condition}\nWHEN NOT MATCHED THEN INSERT (', etl)
+      self.assertNotIn('NOT EXISTS', etl)
+
+    target_table = self.create_customer_s(generate_type='table', load_strategy='merge', compare_to='latest')
+    [_, (_, etl)] = self.templates.render(target_table, self.create_customer_s_mappings(target_table))
+    self.assertIn('ON (\n  t.customer_key = s.customer_key\n  AND t.load_dts = s.load_dts\n)', etl)
+    # One probe of the latest versions, both for changed and for already loaded versions
+    self.assertEqual(etl.count('NOT EXISTS'), 1)
+
+    with self.assertRaises(MetaDataError):
+      self.create_customer_h(load_strategy='upsert')
+
+  def test_dedup_per_source(self):
+    # Each source table is reduced to the first load_dts of each key before the union
+    for (target_table, create_mappings) in [
+      (self.create_customer_h(), self.create_customer_h_mappings),
+      (self.create_sales_line_customer_l(), self.create_sales_line_customer_l_mappings),
+    ]:
+      mappings = create_mappings(target_table)
+      sql = self.render_view(target_table, mappings)
+      self.assertEqual(sql.count('min(load_dts) AS load_dts'), len(mappings.source_tables(target_table)))
+      self.assertEqual(sql.count('row_number()'), 1)
+
+  def test_source_style_cte(self):
+    ts = self.start_ts
+    for (create_table, create_mappings) in [
+      (self.create_customer_h, self.create_customer_h_mappings),
+      (self.create_sales_line_customer_l, self.create_sales_line_customer_l_mappings),
+      (self.create_customer_s, self.create_customer_s_mappings),
+    ]:
+      results = []
+      for source_style in ['inline', 'cte']:
+        self.cur.execute('DROP TABLE IF EXISTS db.customers')
+        self.cur.execute('DROP TABLE IF EXISTS db.sales_lines')
+        target_table = create_table(generate_type='table', source_style=source_style)
+        self.cur.execute(f'DROP TABLE IF EXISTS {target_table.full_name}')
+        [(_, ddl), (_, etl)] = self.templates.render(target_table, create_mappings(target_table))
+        if source_style == 'cte':
+          self.assertTrue(etl.split('\n\n')[1].startswith('INSERT INTO {}\nWITH\n'.format(target_table.full_name)))
+          # The source tables are only read, and the load window only applied, in the CTEs
+          source_tables = create_mappings(target_table).source_tables(target_table)
+          for source_table in source_tables:
+            self.assertEqual(etl.count(source_table.full_name), 1)
+          self.assertEqual(etl.count(':start_ts'), len(source_tables))
+        self.cur.executescript(ddl)
+        self.create_customers()
+        self.create_sales_lines()
+        self.executescript(etl, {'start_ts': ts, 'end_ts': ts + 21})
+        self.executescript(etl, {'start_ts': ts + 21, 'end_ts': ts + 4000})
+        results.append(list(self.cur.execute(f'SELECT * FROM {target_table.full_name} ORDER BY 1, 2')))
+      self.assertEqual(results[0], results[1])
+
+    with self.assertRaises(MetaDataError):
+      self.create_customer_h(source_style='subquery')
+
+  def test_hub_incremental(self):
+    target_table = self.create_customer_h(generate_type='incremental')
+    mappings = self.create_customer_h_mappings(target_table)
+    [(ddl_path, ddl), (etl_path, etl)] = self.templates.render(target_table, mappings)
+    self.assertEqual(etl_path.as_posix(), 'db/customer_h_etl.sql')
+    self.assertNotIn(':start_ts', etl)
+    (template_path, watermark_path) = self.templates.watermark_output('db')
+    self.assertEqual(watermark_path.as_posix(), 'db/load_watermark_t.sql')
+
+    self.cur.executescript(self.templates.render_template(template_path, schema='db'))
+    self.cur.executescript(ddl)
+    self.cur.execute('CREATE TABLE db.customers (ssn, name, load_dts)')
+    self.cur.execute('CREATE TABLE db.sales_lines (txn_id, ssn, load_dts)')
+    ts = self.start_ts
+    # An empty first load leaves no watermark, so that the next load reads all rows
+    self.cur.executescript(etl)
+    self.assertEqual(list(self.cur.execute('SELECT table_name, load_dts FROM db.load_watermark')), [])
+    self.cur.executemany('INSERT INTO db.customers VALUES(?, ?, ?)', [
+      ('198001010101', 'Michael', ts),
+      ('199001010101', 'Jessica', ts + 1),
+    ])
+    self.cur.executescript(etl)
+    self.assertEqual(list(self.cur.execute('SELECT table_name, load_dts FROM db.load_watermark')), [('db.customer_h', ts + 1)])
+
+    # Only the rows loaded after the watermark are read, an older row is left out
+    self.cur.executemany('INSERT INTO db.customers VALUES(?, ?, ?)', [
+      ('199201010101', 'Ashley', ts + 2),
+      ('197001010101', 'Late', ts - 1),
+    ])
+    self.cur.executescript(etl)
+    result = list(self.cur.execute('SELECT ssn FROM db.customer_h ORDER BY load_dts'))
+    self.assertEqual(result, [('198001010101',), ('199001010101',), ('199201010101',)])
+    self.assertEqual(list(self.cur.execute('SELECT table_name, load_dts FROM db.load_watermark')), [('db.customer_h', ts + 2)])
+
+    # A watermark without a load_dts, as written by earlier versions after an empty load, does not block the loads
+    self.cur.execute('UPDATE db.load_watermark SET load_dts = NULL')
+    self.cur.execute("INSERT INTO db.customers VALUES('196001010101', 'Old', ?)", (ts - 2,))
+    self.cur.executescript(etl)
+    self.assertEqual(len(list(self.cur.execute('SELECT * FROM db.customer_h'))), 5)
@@ -131,6 +131,68 @@ class TestStandardVPTemplates(unittest.TestCase):
     ]
     self.assertEqual(result, expected)
 
+  def test_vp_1_effectivity_table(self):
+    sat1 = create_example_satellite("1")
+    hub1 = create_example_hub("1")
+    link_1_2 = create_example_link("1", "2")
+    hub2 = create_example_hub("2")
+    sat2 = create_example_satellite("2", generate_type='table', effectivity_table='true')
+    vp_1_2 = create_example_version_pointer("1", "2")
+    schema = Schema('dv', [sat1, hub1, link_1_2, hub2, sat2, vp_1_2])
+    table_mappings = TableMappings([t._asdict() for t in [
+      TableMapping("dv", "example1_s", "", "dv", "example_1_2_vp"),
+      TableMapping("dv", "example1_h", "", "dv", "example_1_2_vp"),
+      TableMapping("dv", "example_1_2_l", "", "dv", "example_1_2_vp"),
+      TableMapping("dv", "example2_h", "", "dv", "example_1_2_vp"),
+      TableMapping("dv", "example2_s", "", "dv", "example_1_2_vp")
+    ]])
+    column_mappings = ColumnMappings([c._asdict() for c in [
+      ColumnMapping("dv", "example1_s", "example1_key", "", "dv", "example_1_2_vp", "example1_m_key"),
+      ColumnMapping("dv", "example2_s", "example2_key", "", "dv", "example_1_2_vp", "example2_c_key"),
+      ColumnMapping("dv", "example2_s", "load_dts", "", "dv", "example_1_2_vp", "example2_c_load_dts"),
+      ColumnMapping("dv", "example1_s", "load_dts", "", "dv", "example_1_2_vp", "load_dts"),
+    ]])
+    mappings = Mappings(table_mappings, column_mappings, list(schema.tables.values()))
+    mappings.check(vp_1_2)
+    self.assertEqual(
+      [out_path.as_posix() for (_, out_path) in self.templates.outputs(sat2)],
+      ['dv/example2_s_t.sql', 'dv/example2_s_eff_t.sql', 'dv/example2_s_etl.sql']
+    )
+
+    self.create_tables(sat1, hub1, link_1_2, hub2, sat2)
+    self.cur.executescript(self.templates.render_template('create_effectivity_table.sql', target_table=sat2))
+    effectivity_etl = self.templates.render_template('effectivity_etl.sql', target_table=sat2)
+    ts = self.start_ts
+    self.cur.executemany('INSERT INTO dv.example1_s VALUES(?, ?, ?, ?, ?, ?)', [
+      ('1', ts+10, 'a', 'b', ts+3, ''),
+    ])
+    self.cur.executemany('INSERT INTO dv.example_1_2_l VALUES(?, ?, ?, ?, ?)', [
+      ('19', '1', '9', ts+10, ''),
+    ])
+    load_window = lambda start_ts, end_ts: effectivity_etl.replace(':start_ts', str(start_ts)).replace(':end_ts', str(end_ts))
+    self.cur.execute('INSERT INTO dv.example2_s VALUES(?, ?, ?, ?, ?, ?)', ('9', ts+11, 'c', 'd', ts, ''))
+    self.cur.executescript(load_window(ts+11, ts+12))
+    # A new version ends the range of the previous version of the key
+    self.cur.execute('INSERT INTO dv.example2_s VALUES(?, ?, ?, ?, ?, ?)', ('9', ts+12, 'e', 'f', ts+5, ''))
+    # Only the keys with versions in the load window are recomputed
+    self.cur.execute('INSERT INTO dv.example2_s VALUES(?, ?, ?, ?, ?, ?)', ('8', ts+1, 'g', 'h', ts, ''))
+    self.cur.executescript(load_window(ts+12, ts+13))
+    result = self.cur.execute('SELECT example2_key, load_dts, effective_ts FROM dv.example2_s_eff ORDER BY load_dts').fetchall()
+    self.assertEqual(result, [('9', ts+11, ts), ('9', ts+12, ts+5)])
+    self.assertEqual(self.cur.execute('SELECT effective_ts_end FROM dv.example2_s_eff WHERE load_dts = ?', (ts+11,)).fetchall(), [(ts+5,)])
+
+    sql = self.render_view(vp_1_2, mappings)
+    self.assertNotIn('lead(', sql)
+    self.cur.executescript(sql)
+    result = self.cur.execute('SELECT * FROM dv.example_1_2_vp ORDER BY load_dts').fetchall()
+    expected = [
+      ('1', '9', ts+11, ts+10)
+    ]
+    self.assertEqual(result, expected)
+
+    with self.assertRaises(MetaDataError):
+      create_example_satellite("2", effectivity_table='true')
+
   def test_vp_1_es(self):
     sat1 = create_example_satellite("1")
     hub1 = create_example_hub("1")
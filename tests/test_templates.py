@@ -0,0 +1,109 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from dwgenerator.dbobjects import Schema
+from dwgenerator.mappings import TableMappings, ColumnMappings, Mappings
+from dwgenerator.templates import Templates
+from .utils import TableMapping, ColumnMapping, create_example_hub, create_example_link, create_example_satellite, create_example_version_pointer
+
+class TestTemplates(unittest.TestCase):
+  def setUp(self):
+    self.hub = create_example_hub("1")
+    table_mappings = TableMappings([
+      TableMapping("src", "customers", "", "dv", "example1_h")._asdict()
+    ])
+    column_mappings = ColumnMappings([c._asdict() for c in [
+      ColumnMapping("src", "customers", "id", "", "dv", "example1_h", "example1_key"),
+      ColumnMapping("src", "customers", "id1", "", "dv", "example1_h", "example_id1"),
+      ColumnMapping("src", "customers", "id2", "", "dv", "example1_h", "example_id2"),
+      ColumnMapping("src", "customers", "ts", "", "dv", "example1_h", "load_dts"),
+      ColumnMapping("src", "customers", "", "'src'", "dv", "example1_h", "rec_src"),
+    ]])
+    self.mappings = Mappings(table_mappings, column_mappings, [self.hub] + column_mappings.source_tables())
+
+  def render(self, templates):
+    return [(path.as_posix(), sql) for (path, sql) in templates.render(self.hub, self.mappings)]
+
+  def test_generate(self):
+    templates = Templates('snowflake')
+    for (template_path, out_path) in templates.outputs(self.hub):
+      self.assertEqual(out_path.as_posix(), 'dv/example1_h_v.sql')
+      self.assertEqual(
+        ''.join(templates.generate_template(template_path, target_table=self.hub, mappings=self.mappings)),
+        templates.render_template(template_path, target_table=self.hub, mappings=self.mappings)
+      )
+
+  def test_bytecode_cache(self):
+    expected = self.render(Templates('snowflake'))
+    with tempfile.TemporaryDirectory() as cache_dir:
+      self.assertEqual(self.render(Templates('snowflake', bytecode_cache_dir=cache_dir)), expected)
+      self.assertTrue(any((Path(cache_dir) / 'snowflake').iterdir()))
+      self.assertEqual(self.render(Templates('snowflake', bytecode_cache_dir=cache_dir)), expected)
+
+  def test_compiled_templates(self):
+    with tempfile.TemporaryDirectory() as compiled_dir:
+      Templates('snowflake').compile(compiled_dir)
+      self.assertEqual(
+        self.render(Templates('snowflake', compiled_dir=compiled_dir)),
+        self.render(Templates('snowflake'))
+      )
+      self.assertTrue(Templates('snowflake', compiled_dir=compiled_dir).compiled)
+      # Templates compiled for another dbtype are not used
+      self.assertFalse(Templates('standard', compiled_dir=compiled_dir).compiled)
+      self.assertEqual(
+        self.render(Templates('standard', compiled_dir=compiled_dir)),
+        self.render(Templates('standard'))
+      )
+      # Templates compiled from other template sources are not used
+      (Path(compiled_dir) / 'snowflake.fingerprint').write_text('edited')
+      self.assertFalse(Templates('snowflake', compiled_dir=compiled_dir).compiled)
+
+  def test_table_options(self):
+    def ddl_end(dbtype, **properties):
+      hub = create_example_hub("1", **properties)
+      ddl = Templates(dbtype).render_template('create_table.sql', target_table=hub)
+      return ddl[ddl.rindex('\n)') + 1:]
+    self.assertEqual(ddl_end('standard'), ');')
+    self.assertEqual(ddl_end('snowflake'), ')\nCLUSTER BY (example1_key);')
+    self.assertEqual(ddl_end('snowflake', cluster_by=''), ');')
+    self.assertEqual(ddl_end('bq'), ')\nPARTITION BY DATE(load_dts)\nCLUSTER BY example1_key;')
+    self.assertEqual(
+      ddl_end('bq', partition_by='TIMESTAMP_TRUNC(load_dts, MONTH)', cluster_by='example_id1, example_id2'),
+      ')\nPARTITION BY TIMESTAMP_TRUNC(load_dts, MONTH)\nCLUSTER BY example_id1, example_id2;'
+    )
+    self.assertEqual(ddl_end('bq', partition_by='', cluster_by=''), ');')
+
+  def test_qualify(self):
+    vp = create_example_version_pointer("1", "2")
+    schema = Schema('dv', [
+      create_example_satellite("1"), create_example_hub("1"), create_example_link("1", "2"),
+      create_example_hub("2"), create_example_satellite("2"), vp
+    ])
+    table_mappings = TableMappings([
+      TableMapping("dv", table, "", "dv", "example_1_2_vp")._asdict()
+      for table in ["example1_s", "example1_h", "example_1_2_l", "example2_h", "example2_s"]
+    ])
+    column_mappings = ColumnMappings([c._asdict() for c in [
+      ColumnMapping("dv", "example1_s", "example1_key", "", "dv", "example_1_2_vp", "example1_m_key"),
+      ColumnMapping("dv", "example2_s", "example2_key", "", "dv", "example_1_2_vp", "example2_c_key"),
+      ColumnMapping("dv", "example2_s", "load_dts", "", "dv", "example_1_2_vp", "example2_c_load_dts"),
+      ColumnMapping("dv", "example1_s", "load_dts", "", "dv", "example_1_2_vp", "load_dts"),
+    ]])
+    vp_mappings = Mappings(table_mappings, column_mappings, list(schema.tables.values()))
+    def render(dbtype, target_table, mappings):
+      [(_, sql)] = Templates(dbtype).render(target_table, mappings)
+      return sql
+    def output_columns(sql):
+      select = sql[sql.index('SELECT\n'):]
+      return select[:select.index('\nFROM')]
+    standard_sql = render('standard', self.hub, self.mappings)
+    for dbtype in ['snowflake', 'bq']:
+      sql = render(dbtype, self.hub, self.mappings)
+      self.assertEqual(output_columns(sql), output_columns(standard_sql))
+      self.assertIn('\nQUALIFY row_number() over(PARTITION BY ', sql)
+      self.assertNotIn('rn = 1', sql)
+      # The version pointer keeps the effectivity range joins, that only match one version per metrics row
+      sql = render(dbtype, vp, vp_mappings)
+      self.assertIn('lead(', sql)
+      self.assertNotIn('QUALIFY', sql)
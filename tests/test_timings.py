@@ -0,0 +1,20 @@
+import pickle
+import unittest
+
+from dwgenerator.timings import Timings
+
+class TestTimings(unittest.TestCase):
+  def test_timings(self):
+    timings = Timings()
+    with timings.phase('read'):
+      pass
+    for table_name in ['dv.a_h', 'dv.b_h', 'dv.a_h']:
+      with timings.phase('render', table_name):
+        pass
+    table_timings = pickle.loads(pickle.dumps(timings))
+    timings.merge(table_timings)
+    self.assertEqual(timings.phases['read'][1], 2)
+    self.assertEqual(timings.phases['render'][1], 6)
+    self.assertEqual(sorted(timings.tables), ['dv.a_h', 'dv.b_h'])
+    summary = timings.summary(top=1)
+    self.assertEqual(len(summary), 1 + 2 + 2 + 1)